@@ -1,18 +1,2511 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
 import webbrowser
-import tempfile
 import os
 import json
 import urllib.request
 import urllib.parse
-from datetime import datetime, timedelta
+import urllib.error
+import http.client
+import socket
+import time
+import zlib
+import gzip
+import base64
+import hashlib
+import asyncio
+import email.parser
+import sqlite3
+import calendar
+from collections import deque, OrderedDict
+from datetime import datetime, date, timedelta, timezone
 import ssl
 import re
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Brotli é opcional; sem ele negociamos apenas gzip/deflate
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# NumPy é opcional; sem ele os indicadores usam as versões em Python puro
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from zoneinfo import ZoneInfo
+    FUSO_B3 = ZoneInfo('America/Sao_Paulo')
+except Exception:
+    # Sem base de fusos (ex.: Windows sem tzdata); Brasil sem horário de verão desde 2019
+    FUSO_B3 = timezone(timedelta(hours=-3))
 
 # Contornar problema de SSL
 ssl._create_default_https_context = ssl._create_unverified_context
 
+# Pasta local com o cache persistente do analisador
+DIRETORIO_DADOS = os.path.join(os.path.expanduser('~'), '.analisador_acoes')
+
+# Validade de cada dado fundamentalista, em dias úteis. Os que dependem do preço
+# mudam todo pregão; os de balanço só mudam na divulgação de resultados.
+VALIDADE_FUNDAMENTOS = {
+    'dividendYield': 1,
+    'priceToBook': 1,
+    'trailingEps': 20,
+    'payoutRatio': 20,
+    'bookValue': 20,
+    'returnOnEquity': 20
+}
+# Campos que mudam com a divulgação de resultados (expiram no próximo balanço)
+CAMPOS_DE_BALANCO = ('trailingEps', 'payoutRatio', 'bookValue', 'returnOnEquity')
+# Campos que o Retention Ratio usa (o dividend yield só entra na estimativa sem payout)
+CAMPOS_RETENCAO = ('payoutRatio', 'returnOnEquity')
+
+
+def cobre_campos(fundamentos, campos=None):
+    """Se os fundamentos trazem todos os campos pedidos (todos os conhecidos, se campos=None)"""
+    return all(campo in fundamentos for campo in (campos or VALIDADE_FUNDAMENTOS))
+
+
+class CalendarioB3:
+    """Pregões da B3: dias úteis sem feriados e horário do pregão regular"""
+
+    ABERTURA = (10, 0)
+    FECHAMENTO = (17, 0)
+    # Leilão de fechamento e atraso das cotações: antes disso o último preço ainda pode mudar
+    MARGEM_FECHAMENTO = timedelta(minutes=30)
+
+    # Feriados nacionais e dias sem pregão (véspera de Natal e último dia do ano)
+    FERIADOS_FIXOS = ((1, 1), (4, 21), (5, 1), (9, 7), (10, 12), (11, 2), (11, 15), (11, 20),
+                      (12, 24), (12, 25), (12, 31))
+    # Dias relativos à Páscoa: Carnaval (segunda e terça), Sexta-feira Santa, Corpus Christi
+    FERIADOS_MOVEIS = (-48, -47, -2, 60)
+
+    def __init__(self, fuso=FUSO_B3):
+        self.fuso = fuso
+        self._feriados = {}
+
+    @staticmethod
+    def pascoa(ano):
+        """Domingo de Páscoa (algoritmo de Meeus/Jones/Butcher)"""
+        a, b, c = ano % 19, ano // 100, ano % 100
+        d, e = divmod(b, 4)
+        g = (8 * b + 13) // 25
+        h = (19 * a + b - d - g + 15) % 30
+        i, k = divmod(c, 4)
+        l = (32 + 2 * e + 2 * i - h - k) % 7
+        m = (a + 11 * h + 22 * l) // 451
+        mes, dia = divmod(h + l - 7 * m + 114, 31)
+        return date(ano, mes, dia + 1)
+
+    def feriados(self, ano):
+        if ano not in self._feriados:
+            pascoa = self.pascoa(ano)
+            self._feriados[ano] = ({date(ano, mes, dia) for mes, dia in self.FERIADOS_FIXOS} |
+                                   {pascoa + timedelta(days=dias) for dias in self.FERIADOS_MOVEIS})
+        return self._feriados[ano]
+
+    def eh_pregao(self, dia):
+        return dia.weekday() < calendar.SATURDAY and dia not in self.feriados(dia.year)
+
+    def agora(self):
+        return datetime.now(self.fuso)
+
+    def _horario(self, dia, hora_minuto):
+        return datetime(dia.year, dia.month, dia.day, *hora_minuto, tzinfo=self.fuso)
+
+    def em_negociacao(self, momento=None):
+        """Pregão aberto (ou fechando) agora: cotações ainda mudam"""
+        momento = momento or self.agora()
+        dia = momento.astimezone(self.fuso).date()
+        return (self.eh_pregao(dia) and
+                self._horario(dia, self.ABERTURA) <= momento < self._horario(dia, self.FECHAMENTO) + self.MARGEM_FECHAMENTO)
+
+    def proxima_abertura(self, momento=None):
+        momento = momento or self.agora()
+        dia = momento.astimezone(self.fuso).date()
+        while not (self.eh_pregao(dia) and self._horario(dia, self.ABERTURA) > momento):
+            dia += timedelta(days=1)
+        return self._horario(dia, self.ABERTURA)
+
+    def ultimo_fechamento(self, momento=None):
+        """Momento a partir do qual o último pregão encerrado tem preços definitivos"""
+        momento = momento or self.agora()
+        dia = momento.astimezone(self.fuso).date()
+        while not (self.eh_pregao(dia) and self._horario(dia, self.FECHAMENTO) + self.MARGEM_FECHAMENTO <= momento):
+            dia -= timedelta(days=1)
+        return self._horario(dia, self.FECHAMENTO) + self.MARGEM_FECHAMENTO
+
+    def inicio_pregoes(self, pregoes, momento=None):
+        """Primeiro dia da janela com os últimos `pregoes` pregões (hoje incluído, se houver pregão)"""
+        dia = (momento or self.agora()).astimezone(self.fuso).date()
+        while True:
+            if self.eh_pregao(dia):
+                pregoes -= 1
+                if pregoes <= 0:
+                    return dia
+            dia -= timedelta(days=1)
+
+    def validade(self, ttl, momento=None):
+        """Segundos de validade de uma cotação: `ttl` no pregão, até a próxima abertura fora dele"""
+        momento = momento or self.agora()
+        if self.em_negociacao(momento):
+            return ttl
+        return max(ttl, (self.proxima_abertura(momento) - momento).total_seconds())
+
+
+CALENDARIO_B3 = CalendarioB3()
+
+
+def somar_dias_uteis(inicio, dias):
+    """Data (meia-noite) após `dias` pregões da B3 a partir de `inicio`"""
+    data = datetime(inicio.year, inicio.month, inicio.day)
+    while dias > 0:
+        data += timedelta(days=1)
+        if CALENDARIO_B3.eh_pregao(data.date()):
+            dias -= 1
+    return data
+
+class RespostaHTTP:
+    """Resposta já lida pelo ClienteHTTP"""
+
+    def __init__(self, status, motivo, cabecalhos, corpo):
+        self.status = status
+        self.reason = motivo
+        self.cabecalhos = cabecalhos
+        self.corpo = corpo
+
+    def json(self):
+        return json.loads(self.corpo.decode())
+
+
+class Descompressor:
+    """Descompressão incremental do corpo conforme o Content-Encoding"""
+
+    def __init__(self, codificacao):
+        self.codificacao = (codificacao or 'identity').strip().lower()
+        if self.codificacao in ('gzip', 'x-gzip'):
+            self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self.codificacao == 'deflate':
+            self._obj = zlib.decompressobj()
+            self._inicio = True
+        elif self.codificacao == 'br' and brotli is not None:
+            self._obj = brotli.Decompressor()
+        elif self.codificacao == 'identity':
+            self._obj = None
+        else:
+            raise urllib.error.URLError(f"Content-Encoding não suportado: {codificacao}")
+
+    def processar(self, bloco):
+        if self._obj is None:
+            return bloco
+        if self.codificacao == 'br':
+            return self._obj.process(bloco)
+        if self.codificacao == 'deflate' and self._inicio:
+            self._inicio = False
+            try:
+                return self._obj.decompress(bloco)
+            except zlib.error:
+                # Alguns servidores mandam deflate "cru", sem cabeçalho zlib
+                self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self._obj.decompress(bloco)
+
+    def finalizar(self):
+        if self._obj is None or self.codificacao == 'br':
+            return b''
+        return self._obj.flush()
+
+
+class ClienteHTTP:
+    """Cliente HTTP assíncrono com pool de conexões keep-alive por host"""
+
+    REDIRECIONAMENTOS = (301, 302, 303, 307, 308)
+    ACCEPT_ENCODING = 'gzip, deflate, br' if brotli is not None else 'gzip, deflate'
+    TAMANHO_BLOCO = 64 * 1024
+
+    def __init__(self, tamanho_pool=4, tempo_ocioso=30.0, capacidade_validacao=512):
+        self.tamanho_pool = tamanho_pool  # Conexões simultâneas por host
+        self.tempo_ocioso = tempo_ocioso  # Segundos até descartar uma conexão parada
+        self._ociosas = {}  # (esquema, host, porta) -> [(leitor, escritor, instante_devolucao)]
+        self._vagas = {}    # (esquema, host, porta) -> asyncio.Semaphore
+        # Respostas com ETag/Last-Modified, para revalidar com GET condicional
+        self.capacidade_validacao = capacidade_validacao
+        self._validadas = OrderedDict()  # (caminho, consulta) -> RespostaHTTP
+        self.estatisticas = {'bytes_transferidos': 0, 'bytes_descomprimidos': 0, 'revalidadas': 0}
+
+    def _vagas_do_host(self, chave):
+        if chave not in self._vagas:
+            self._vagas[chave] = asyncio.Semaphore(self.tamanho_pool)
+        return self._vagas[chave]
+
+    async def _retirar_conexao(self, chave):
+        """Reaproveitar uma conexão ociosa do host ou abrir uma nova"""
+        agora = time.monotonic()
+        ociosas = self._ociosas.get(chave, [])
+        while ociosas:
+            leitor, escritor, instante = ociosas.pop()
+            if agora - instante <= self.tempo_ocioso and not leitor.at_eof() and not escritor.is_closing():
+                return leitor, escritor, True
+            escritor.close()
+
+        esquema, host, porta = chave
+        if esquema == 'https':
+            leitor, escritor = await asyncio.open_connection(
+                host, porta, ssl=ssl._create_default_https_context(), server_hostname=host)
+        else:
+            leitor, escritor = await asyncio.open_connection(host, porta)
+        return leitor, escritor, False
+
+    def _devolver_conexao(self, chave, leitor, escritor):
+        self._ociosas.setdefault(chave, []).append((leitor, escritor, time.monotonic()))
+
+    def fechar(self):
+        """Fechar todas as conexões ociosas"""
+        for ociosas in self._ociosas.values():
+            for _, escritor, _ in ociosas:
+                escritor.close()
+        self._ociosas.clear()
+
+    async def obter(self, url, cabecalhos=None, timeout=15, revalidar=False):
+        """Fazer um GET reaproveitando conexões; erros seguem o padrão do urllib"""
+        # Chave sem o host: query1 e query2 servem o mesmo recurso
+        partes = urllib.parse.urlsplit(url)
+        chave = (partes.path, partes.query) if revalidar else None
+        guardada = self._validadas.get(chave) if chave else None
+        if guardada is not None:
+            cabecalhos = dict(cabecalhos or {})
+            if guardada.cabecalhos.get('ETag'):
+                cabecalhos['If-None-Match'] = guardada.cabecalhos.get('ETag')
+            if guardada.cabecalhos.get('Last-Modified'):
+                cabecalhos['If-Modified-Since'] = guardada.cabecalhos.get('Last-Modified')
+
+        try:
+            resposta = await asyncio.wait_for(self._obter(url, cabecalhos), timeout)
+        except asyncio.TimeoutError:
+            raise socket.timeout("Tempo limite de conexão excedido")
+
+        if chave is not None:
+            if resposta.status == 304 and guardada is not None:
+                # Não modificado: só os cabeçalhos trafegaram
+                self.estatisticas['revalidadas'] += 1
+                self._validadas.move_to_end(chave)
+                return guardada
+            if resposta.status == 200 and (resposta.cabecalhos.get('ETag') or
+                                           resposta.cabecalhos.get('Last-Modified')):
+                self._validadas[chave] = resposta
+                self._validadas.move_to_end(chave)
+                while len(self._validadas) > self.capacidade_validacao:
+                    self._validadas.popitem(last=False)
+        return resposta
+
+    async def _obter(self, url, cabecalhos):
+        cabecalhos = dict(cabecalhos or {})
+        cabecalhos['Accept-Encoding'] = self.ACCEPT_ENCODING
+
+        for _ in range(5):
+            partes = urllib.parse.urlsplit(url)
+            porta = partes.port or (443 if partes.scheme == 'https' else 80)
+            chave = (partes.scheme, partes.hostname, porta)
+            caminho = (partes.path or '/') + (f"?{partes.query}" if partes.query else '')
+
+            status, motivo, cab, corpo = await self._requisitar(chave, partes.netloc, caminho, cabecalhos)
+
+            if status in self.REDIRECIONAMENTOS and cab.get('Location'):
+                url = urllib.parse.urljoin(url, cab.get('Location'))
+                continue
+
+            if status >= 400:
+                raise urllib.error.HTTPError(url, status, motivo, cab, None)
+
+            return RespostaHTTP(status, motivo, cab, corpo)
+
+        raise urllib.error.URLError("Redirecionamentos demais")
+
+    async def _requisitar(self, chave, host, caminho, cabecalhos):
+        linhas = [f"GET {caminho} HTTP/1.1", f"Host: {host}"]
+        linhas += [f"{nome}: {valor}" for nome, valor in cabecalhos.items()]
+        requisicao = ("\r\n".join(linhas) + "\r\n\r\n").encode('latin-1')
+
+        async with self._vagas_do_host(chave):
+            for tentativa in range(2):
+                try:
+                    leitor, escritor, reutilizada = await self._retirar_conexao(chave)
+                except OSError as e:
+                    raise urllib.error.URLError(e)
+
+                try:
+                    escritor.write(requisicao)
+                    await escritor.drain()
+                    status, motivo, cab = await self._ler_cabecalho(leitor)
+                    corpo, reutilizavel = await self._ler_corpo(leitor, status, cab)
+                except (ConnectionError, asyncio.IncompleteReadError) as e:
+                    escritor.close()
+                    # O servidor pode ter encerrado a conexão ociosa; tentar uma nova
+                    if reutilizada and tentativa == 0:
+                        continue
+                    raise urllib.error.URLError(e)
+                except (OSError, ValueError) as e:
+                    escritor.close()
+                    raise urllib.error.URLError(e)
+                except BaseException:
+                    # Cancelamento (timeout) no meio da resposta: conexão inutilizada
+                    escritor.close()
+                    raise
+
+                if reutilizavel:
+                    self._devolver_conexao(chave, leitor, escritor)
+                else:
+                    escritor.close()
+                return status, motivo, cab, corpo
+
+    async def _ler_cabecalho(self, leitor):
+        linha = await leitor.readline()
+        if not linha:
+            raise asyncio.IncompleteReadError(linha, None)
+
+        versao, status, *motivo = linha.decode('latin-1').strip().split(' ', 2)
+        if not versao.startswith('HTTP/'):
+            raise ValueError(f"Resposta HTTP inválida: {linha!r}")
+
+        bruto = []
+        while True:
+            linha = await leitor.readline()
+            if linha in (b'\r\n', b'\n', b''):
+                break
+            bruto.append(linha.decode('latin-1'))
+
+        cab = email.parser.Parser(_class=http.client.HTTPMessage).parsestr(''.join(bruto))
+        cab.versao = versao
+        return int(status), motivo[0] if motivo else '', cab
+
+    async def _ler_corpo(self, leitor, status, cab):
+        """Ler o corpo em blocos, descomprimindo enquanto chega"""
+        reutilizavel = (cab.versao == 'HTTP/1.1'
+                        and (cab.get('Connection') or '').lower() != 'close')
+
+        if status < 200 or status in (204, 304):
+            return b'', reutilizavel
+
+        descompressor = Descompressor(cab.get('Content-Encoding'))
+        partes = []
+        transferidos = 0
+
+        if 'chunked' in (cab.get('Transfer-Encoding') or '').lower():
+            while True:
+                tamanho = int((await leitor.readline()).split(b';')[0].strip(), 16)
+                if tamanho == 0:
+                    # Ignorar trailers até a linha em branco
+                    while (await leitor.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                bloco = await leitor.readexactly(tamanho)
+                await leitor.readexactly(2)
+                transferidos += len(bloco)
+                partes.append(descompressor.processar(bloco))
+        elif cab.get('Content-Length') is not None:
+            restante = int(cab.get('Content-Length'))
+            while restante > 0:
+                bloco = await leitor.readexactly(min(restante, self.TAMANHO_BLOCO))
+                restante -= len(bloco)
+                transferidos += len(bloco)
+                partes.append(descompressor.processar(bloco))
+        else:
+            # Sem tamanho definido o corpo termina quando o servidor fecha a conexão
+            reutilizavel = False
+            while True:
+                bloco = await leitor.read(self.TAMANHO_BLOCO)
+                if not bloco:
+                    break
+                transferidos += len(bloco)
+                partes.append(descompressor.processar(bloco))
+        partes.append(descompressor.finalizar())
+
+        corpo = b''.join(partes)
+        self.estatisticas['bytes_transferidos'] += transferidos
+        self.estatisticas['bytes_descomprimidos'] += len(corpo)
+        return corpo, reutilizavel
+
+
+def eh_sobrecarga(erro):
+    """Identificar respostas 429 do Yahoo, seja via HTTP direto ou via yfinance"""
+    if isinstance(erro, urllib.error.HTTPError):
+        return erro.code == 429
+    return type(erro).__name__ == 'YFRateLimitError' or 'Too Many Requests' in str(erro)
+
+
+class LimitadorTaxa:
+    """Token bucket com concorrência adaptativa (AIMD) para as chamadas ao Yahoo"""
+
+    def __init__(self, taxa=5.0, rajada=10, concorrencia_inicial=4, concorrencia_maxima=16,
+                 latencia_alvo=3.0, pausa_sobrecarga=5.0, tentativas_sobrecarga=3):
+        self.taxa = taxa                          # Fichas repostas por segundo
+        self.rajada = rajada                      # Máximo de fichas acumuladas
+        self.limite = float(concorrencia_inicial)  # Chamadas simultâneas permitidas agora
+        self.concorrencia_maxima = concorrencia_maxima
+        self.latencia_alvo = latencia_alvo        # Acima disso a concorrência é reduzida
+        self.pausa_sobrecarga = pausa_sobrecarga  # Pausa após 429 sem Retry-After
+        self.tentativas_sobrecarga = tentativas_sobrecarga
+
+        self._fichas = float(rajada)
+        self._ultima_reposicao = time.monotonic()
+        self._pausa_ate = 0.0
+        self._em_andamento = 0
+        self._condicao = None  # Criada dentro do loop do motor
+        self.estatisticas = {'chamadas': 0, 'sobrecargas': 0, 'reducoes_latencia': 0}
+
+    def _obter_condicao(self):
+        if self._condicao is None:
+            self._condicao = asyncio.Condition()
+        return self._condicao
+
+    def _repor_fichas(self, agora):
+        decorrido = agora - self._ultima_reposicao
+        self._fichas = min(self.rajada, self._fichas + decorrido * self.taxa)
+        self._ultima_reposicao = agora
+
+    async def adquirir(self):
+        """Esperar uma vaga de concorrência e uma ficha do balde"""
+        condicao = self._obter_condicao()
+        async with condicao:
+            await condicao.wait_for(lambda: self._em_andamento < max(1, int(self.limite)))
+            self._em_andamento += 1
+
+        while True:
+            agora = time.monotonic()
+            self._repor_fichas(agora)
+            if agora >= self._pausa_ate and self._fichas >= 1:
+                self._fichas -= 1
+                self.estatisticas['chamadas'] += 1
+                return
+            espera = max(self._pausa_ate - agora, (1 - self._fichas) / self.taxa)
+            await asyncio.sleep(espera)
+
+    async def liberar(self, latencia, erro=None):
+        """Devolver a vaga e ajustar a concorrência conforme o resultado"""
+        condicao = self._obter_condicao()
+        async with condicao:
+            self._em_andamento -= 1
+
+            if erro is not None and eh_sobrecarga(erro):
+                # Redução multiplicativa e pausa global até o Yahoo aliviar
+                self.estatisticas['sobrecargas'] += 1
+                self.limite = max(1.0, self.limite / 2)
+                espera = self.pausa_sobrecarga
+                cabecalhos = getattr(erro, 'headers', None)
+                if cabecalhos is not None and str(cabecalhos.get('Retry-After', '')).isdigit():
+                    espera = float(cabecalhos.get('Retry-After'))
+                self._pausa_ate = max(self._pausa_ate, time.monotonic() + espera)
+            elif latencia > self.latencia_alvo:
+                self.estatisticas['reducoes_latencia'] += 1
+                self.limite = max(1.0, self.limite * 0.8)
+            elif erro is None:
+                # Aumento aditivo: cerca de +1 a cada "janela" de chamadas bem-sucedidas
+                self.limite = min(self.concorrencia_maxima, self.limite + 1 / self.limite)
+
+            condicao.notify_all()
+
+    async def executar(self, fabrica):
+        """Executar fabrica() sob o limitador, repetindo quando o Yahoo responde 429"""
+        for tentativa in range(self.tentativas_sobrecarga + 1):
+            await self.adquirir()
+            inicio = time.monotonic()
+            erro = None
+            try:
+                return await fabrica()
+            except Exception as e:
+                erro = e
+                if not eh_sobrecarga(e) or tentativa == self.tentativas_sobrecarga:
+                    raise
+            finally:
+                await self.liberar(time.monotonic() - inicio, erro)
+
+
+def eh_transitorio(erro):
+    """Erros que valem nova tentativa: timeout, falha de rede e 5xx
+
+    O 429 fica de fora: quem repete e pausa após sobrecarga é o LimitadorTaxa.
+    """
+    if isinstance(erro, urllib.error.HTTPError):
+        return erro.code >= 500
+    if eh_sobrecarga(erro):
+        return False
+    # Erros do requests (usado pelo yfinance) também herdam de OSError
+    status = getattr(getattr(erro, 'response', None), 'status_code', None)
+    if status is not None:
+        return status >= 500
+    return isinstance(erro, OSError)
+
+
+def normalizar_simbolo(codigo):
+    """Normalizar o código da ação (maiúsculas, sem o sufixo .SA)"""
+    codigo = codigo.strip().upper()
+    # Remove .SA se presente
+    if codigo.endswith('.SA'):
+        codigo = codigo[:-3]
+    return codigo
+
+
+class CoalescedorRequisicoes:
+    """Single-flight: chamadas simultâneas com a mesma chave compartilham uma execução"""
+
+    def __init__(self):
+        self._em_voo = {}  # chave -> asyncio.Task
+        self.estatisticas = {'execucoes': 0, 'compartilhadas': 0}
+
+    async def executar(self, chave, fabrica):
+        tarefa = self._em_voo.get(chave)
+        if tarefa is None:
+            tarefa = asyncio.ensure_future(fabrica())
+            self._em_voo[chave] = tarefa
+            tarefa.add_done_callback(lambda _: self._em_voo.pop(chave, None))
+            self.estatisticas['execucoes'] += 1
+        else:
+            self.estatisticas['compartilhadas'] += 1
+        # shield: um chamador cancelado não derruba a busca dos demais
+        return await asyncio.shield(tarefa)
+
+
+class CacheTTL:
+    """Cache em memória com validade (TTL) e descarte do menos usado (LRU)"""
+
+    def __init__(self, ttl=60.0, capacidade=256):
+        self.ttl = ttl
+        self.capacidade = capacidade
+        self._itens = OrderedDict()  # chave -> (expira_em, valor)
+        self._trava = threading.Lock()
+        self.estatisticas = {'acertos': 0, 'faltas': 0, 'expirados': 0, 'descartados': 0}
+
+    def obter(self, chave):
+        """Valor guardado ainda válido, ou None"""
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is None:
+                self.estatisticas['faltas'] += 1
+                return None
+            if item[0] <= time.monotonic():
+                del self._itens[chave]
+                self.estatisticas['expirados'] += 1
+                self.estatisticas['faltas'] += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.estatisticas['acertos'] += 1
+            return item[1]
+
+    def guardar(self, chave, valor, ttl=None):
+        with self._trava:
+            self._itens[chave] = (time.monotonic() + (self.ttl if ttl is None else ttl), valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+                self.estatisticas['descartados'] += 1
+
+    def invalidar(self, chave=None):
+        """Descartar uma chave, ou tudo"""
+        with self._trava:
+            if chave is None:
+                self._itens.clear()
+            else:
+                self._itens.pop(chave, None)
+
+
+class MemoriaIndicadores:
+    """Memo limitado (LRU) de indicadores já calculados; None também é um resultado"""
+
+    _AUSENTE = object()
+
+    def __init__(self, capacidade=512):
+        self.capacidade = capacidade
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+        self.estatisticas = {'acertos': 0, 'calculos': 0}
+
+    def obter(self, chave, calcular):
+        with self._trava:
+            valor = self._itens.get(chave, self._AUSENTE)
+            if valor is not self._AUSENTE:
+                self._itens.move_to_end(chave)
+                self.estatisticas['acertos'] += 1
+                return valor
+
+        valor = calcular()
+        with self._trava:
+            self._itens[chave] = valor
+            self.estatisticas['calculos'] += 1
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+        return valor
+
+
+class CircuitoAberto(Exception):
+    """Fonte de dados desativada temporariamente pelo disjuntor"""
+
+
+class PoliticaRetentativa:
+    """Retentativas com backoff exponencial e jitter completo"""
+
+    def __init__(self, tentativas=3, espera_base=0.5, espera_maxima=8.0):
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+
+    def espera(self, tentativa):
+        """Tempo de espera antes da próxima tentativa (0, 1, 2...)"""
+        return random.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** tentativa))
+
+
+class DisjuntorCircuito:
+    """Circuit breaker: após falhas seguidas, pula a fonte durante um tempo"""
+
+    def __init__(self, fonte, limite_falhas=5, tempo_espera=30.0):
+        self.fonte = fonte
+        self.limite_falhas = limite_falhas
+        self.tempo_espera = tempo_espera
+        self.estado = 'fechado'  # fechado -> aberto -> meio_aberto -> fechado
+        self.falhas = 0
+        self._aberto_ate = 0.0
+        self._teste_em_andamento = False
+
+    def verificar(self):
+        """Levantar CircuitoAberto se a fonte ainda estiver desativada"""
+        if self.estado == 'fechado':
+            return
+        agora = time.monotonic()
+        if self.estado == 'aberto' and agora >= self._aberto_ate:
+            self.estado = 'meio_aberto'
+        if self.estado == 'meio_aberto' and not self._teste_em_andamento:
+            # Uma única chamada de teste decide se a fonte voltou
+            self._teste_em_andamento = True
+            return
+        restante = max(0.0, self._aberto_ate - agora)
+        raise CircuitoAberto(f"Fonte {self.fonte} indisponível (nova tentativa em {restante:.0f}s)")
+
+    def registrar_sucesso(self):
+        self.estado = 'fechado'
+        self.falhas = 0
+        self._teste_em_andamento = False
+
+    def registrar_falha(self):
+        self.falhas += 1
+        if self.estado == 'meio_aberto' or self.falhas >= self.limite_falhas:
+            self.estado = 'aberto'
+            self._aberto_ate = time.monotonic() + self.tempo_espera
+        self._teste_em_andamento = False
+
+    def liberar_teste(self):
+        """Chamada sem veredito sobre a fonte (ex.: 429): libera o teste sem mudar o estado"""
+        self._teste_em_andamento = False
+
+
+class MonitorLatencia:
+    """Latências recentes por host, usadas para decidir quando disparar um hedge"""
+
+    def __init__(self, percentil=0.95, amostras=200, minimo_amostras=20, limiar_inicial=1.0):
+        self.percentil = percentil
+        self.amostras = amostras
+        self.minimo_amostras = minimo_amostras  # Antes disso vale o limiar_inicial
+        self.limiar_inicial = limiar_inicial
+        self._latencias = {}  # host -> deque de segundos
+
+    def registrar(self, host, latencia):
+        self._latencias.setdefault(host, deque(maxlen=self.amostras)).append(latencia)
+
+    def limiar(self, host):
+        """Latência no percentil configurado (ex.: p95) das últimas respostas do host"""
+        latencias = self._latencias.get(host)
+        if not latencias or len(latencias) < self.minimo_amostras:
+            return self.limiar_inicial
+        ordenadas = sorted(latencias)
+        return ordenadas[min(len(ordenadas) - 1, int(self.percentil * len(ordenadas)))]
+
+
+class CalculadoraRSIWilder:
+    """RSI com suavização de Wilder, atualizado em O(1) a cada preço novo"""
+
+    def __init__(self, periodo=14):
+        self.periodo = periodo
+        self.ultimo_preco = None
+        self.media_ganhos = 0.0
+        self.media_perdas = 0.0
+        self.contagem = 0  # Variações de preço já incluídas
+        self.data = None   # Data da última barra incluída
+
+    @classmethod
+    def semear(cls, precos, periodo=14):
+        """Calculadora já alimentada com um histórico"""
+        calculadora = cls(periodo)
+        for preco in precos:
+            calculadora.adicionar(preco)
+        return calculadora
+
+    def _proximas_medias(self, preco):
+        mudanca = preco - self.ultimo_preco
+        # Nas primeiras `periodo` variações é a média simples; depois, a suavização de Wilder
+        peso = min(self.contagem + 1, self.periodo)
+        return ((self.media_ganhos * (peso - 1) + max(0.0, mudanca)) / peso,
+                (self.media_perdas * (peso - 1) + max(0.0, -mudanca)) / peso)
+
+    @staticmethod
+    def _rsi(media_ganhos, media_perdas):
+        if media_perdas == 0:
+            return 100
+        return round(100 - (100 / (1 + media_ganhos / media_perdas)), 2)
+
+    def adicionar(self, preco, data=None):
+        """Incluir o próximo preço de fechamento e devolver o RSI atualizado"""
+        if self.ultimo_preco is not None:
+            self.media_ganhos, self.media_perdas = self._proximas_medias(preco)
+            self.contagem += 1
+        self.ultimo_preco = preco
+        self.data = data
+        return self.valor
+
+    def previa(self, preco):
+        """RSI se `preco` fosse o próximo fechamento, sem alterar o estado (barra do dia em aberto)"""
+        if self.ultimo_preco is None or self.contagem + 1 < self.periodo:
+            return None
+        return self._rsi(*self._proximas_medias(preco))
+
+    @property
+    def valor(self):
+        if self.contagem < self.periodo:
+            return None
+        return self._rsi(self.media_ganhos, self.media_perdas)
+
+    def para_dict(self):
+        return dict(vars(self))
+
+    @classmethod
+    def de_dict(cls, estado):
+        calculadora = cls(estado['periodo'])
+        vars(calculadora).update(estado)
+        return calculadora
+
+
+class ArmazemBarras:
+    """Barras diárias (OHLCV) persistidas em SQLite, por ação e data"""
+
+    CAMPOS = ('data', 'timestamp', 'abertura', 'maxima', 'minima', 'fechamento', 'volume')
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        self._trava = threading.Lock()
+        # Vários processos (janelas e execuções em lote) usam o mesmo arquivo:
+        # WAL deixa leitores e um escritor trabalharem juntos, e o busy_timeout
+        # espera a vez em vez de falhar com "database is locked"
+        self._conexao = sqlite3.connect(caminho, timeout=10, check_same_thread=False)
+        self._conexao.execute("PRAGMA busy_timeout = 10000")
+        if caminho != ':memory:':
+            self._conexao.execute("PRAGMA journal_mode = WAL")
+            self._conexao.execute("PRAGMA synchronous = NORMAL")
+        with self._conexao:
+            self._conexao.execute("""
+                CREATE TABLE IF NOT EXISTS barras (
+                    simbolo TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    timestamp INTEGER NOT NULL,
+                    abertura REAL,
+                    maxima REAL,
+                    minima REAL,
+                    fechamento REAL NOT NULL,
+                    volume INTEGER NOT NULL,
+                    PRIMARY KEY (simbolo, data)
+                )""")
+            self._conexao.execute("""
+                CREATE TABLE IF NOT EXISTS ativos (
+                    simbolo TEXT PRIMARY KEY,
+                    nome TEXT,
+                    setor TEXT,
+                    mercado TEXT
+                )""")
+            self._conexao.execute("""
+                CREATE TABLE IF NOT EXISTS atualizacoes (
+                    simbolo TEXT PRIMARY KEY,
+                    atualizado_em REAL NOT NULL
+                )""")
+            self._conexao.execute("""
+                CREATE TABLE IF NOT EXISTS estados_rsi (
+                    simbolo TEXT NOT NULL,
+                    periodo INTEGER NOT NULL,
+                    estado TEXT NOT NULL,
+                    PRIMARY KEY (simbolo, periodo)
+                )""")
+            self._conexao.execute("""
+                CREATE TABLE IF NOT EXISTS cotacoes (
+                    simbolo TEXT PRIMARY KEY,
+                    resultado TEXT NOT NULL,
+                    expira_em REAL NOT NULL
+                )""")
+            self._conexao.execute("""
+                CREATE TABLE IF NOT EXISTS fundamentos (
+                    simbolo TEXT NOT NULL,
+                    campo TEXT NOT NULL,
+                    valor REAL,
+                    expira_em REAL NOT NULL,
+                    PRIMARY KEY (simbolo, campo)
+                )""")
+
+    def salvar(self, simbolo, barras, substituir=False):
+        """Gravar (ou corrigir) barras; a do último pregão pode ter sido parcial
+
+        Com substituir=True o histórico guardado da ação é trocado pelas barras
+        recebidas (histórico revisado por desdobramento ou ajuste de proventos).
+        """
+        with self._trava, self._conexao:
+            # Mesmo sem barras novas (fim de semana) a ação foi conferida agora
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO atualizacoes (simbolo, atualizado_em) VALUES (?, ?)",
+                (simbolo, time.time()))
+            if not barras:
+                return
+            self._descartar_estados_rsi(simbolo, barras, substituir)
+            if substituir:
+                self._conexao.execute("DELETE FROM barras WHERE simbolo = ?", (simbolo,))
+            self._conexao.executemany(
+                "INSERT OR REPLACE INTO barras (simbolo, data, timestamp, abertura, maxima, minima, "
+                "fechamento, volume) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(simbolo,) + tuple(barra[campo] for campo in self.CAMPOS) for barra in barras])
+
+    def _descartar_estados_rsi(self, simbolo, barras, substituir):
+        """Apagar estados de RSI que incluem barras que estão sendo trocadas (chamado dentro de salvar)"""
+        estados = [json.loads(linha[0]) for linha in self._conexao.execute(
+            "SELECT estado FROM estados_rsi WHERE simbolo = ?", (simbolo,))]
+        datas = [estado['data'] for estado in estados if estado.get('data')]
+        if not datas:
+            return
+
+        if substituir:
+            # Histórico inteiro revisado: nenhum estado vale mais
+            alterada = ''
+        else:
+            # Barra já incluída num estado com outro fechamento (ou que faltava) invalida o estado
+            guardados = dict(self._conexao.execute(
+                "SELECT data, fechamento FROM barras WHERE simbolo = ? AND data <= ?", (simbolo, max(datas))))
+            alteradas = [barra['data'] for barra in barras if barra['data'] <= max(datas) and
+                         abs(guardados.get(barra['data'], float('inf')) - barra['fechamento']) >
+                         1e-9 * abs(barra['fechamento'])]
+            if not alteradas:
+                return
+            alterada = min(alteradas)
+
+        for estado in estados:
+            if estado.get('data') and estado['data'] >= alterada:
+                self._conexao.execute("DELETE FROM estados_rsi WHERE simbolo = ? AND periodo = ?",
+                                      (simbolo, estado['periodo']))
+
+    def carregar(self, simbolo, limite=None):
+        """Últimas barras da ação, da mais antiga para a mais recente"""
+        with self._trava:
+            linhas = self._conexao.execute(
+                f"SELECT {', '.join(self.CAMPOS)} FROM barras WHERE simbolo = ? "
+                "ORDER BY data DESC LIMIT ?", (simbolo, limite or -1)).fetchall()
+        return [dict(zip(self.CAMPOS, linha)) for linha in reversed(linhas)]
+
+    def atualizado_em(self, simbolo):
+        """Quando o histórico da ação foi completado pela última vez (epoch), ou None"""
+        with self._trava:
+            linha = self._conexao.execute(
+                "SELECT atualizado_em FROM atualizacoes WHERE simbolo = ?", (simbolo,)).fetchone()
+        return linha[0] if linha else None
+
+    def contar_barras(self, simbolo):
+        with self._trava:
+            return self._conexao.execute("SELECT COUNT(*) FROM barras WHERE simbolo = ?", (simbolo,)).fetchone()[0]
+
+    def barra_conferencia(self, simbolo):
+        """Penúltima barra guardada: já fechada, serve para conferir se o histórico foi revisado"""
+        barras = self.carregar(simbolo, 2)
+        return barras[0] if barras else None
+
+    def primeira_barra(self, simbolo):
+        with self._trava:
+            linha = self._conexao.execute(
+                f"SELECT {', '.join(self.CAMPOS)} FROM barras WHERE simbolo = ? ORDER BY data LIMIT 1",
+                (simbolo,)).fetchone()
+        return dict(zip(self.CAMPOS, linha)) if linha else None
+
+    def carregar_apos(self, simbolo, data):
+        """Barras posteriores a `data` (todas, se `data` for None)"""
+        with self._trava:
+            linhas = self._conexao.execute(
+                f"SELECT {', '.join(self.CAMPOS)} FROM barras WHERE simbolo = ? AND data > ? ORDER BY data",
+                (simbolo, data or '')).fetchall()
+        return [dict(zip(self.CAMPOS, linha)) for linha in linhas]
+
+    def salvar_estado_rsi(self, simbolo, calculadora):
+        with self._trava, self._conexao:
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO estados_rsi (simbolo, periodo, estado) VALUES (?, ?, ?)",
+                (simbolo, calculadora.periodo, json.dumps(calculadora.para_dict())))
+
+    def carregar_estado_rsi(self, simbolo, periodo):
+        with self._trava:
+            linha = self._conexao.execute(
+                "SELECT estado FROM estados_rsi WHERE simbolo = ? AND periodo = ?", (simbolo, periodo)).fetchone()
+        return CalculadoraRSIWilder.de_dict(json.loads(linha[0])) if linha else None
+
+    def salvar_metadados(self, simbolo, nome=None, setor=None, mercado=None):
+        with self._trava, self._conexao:
+            self._conexao.execute(
+                "INSERT INTO ativos (simbolo, nome, setor, mercado) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(simbolo) DO UPDATE SET nome = COALESCE(excluded.nome, nome), "
+                "setor = COALESCE(excluded.setor, setor), mercado = COALESCE(excluded.mercado, mercado)",
+                (simbolo, nome, setor, mercado))
+
+    def carregar_metadados(self, simbolo):
+        with self._trava:
+            linha = self._conexao.execute(
+                "SELECT nome, setor, mercado FROM ativos WHERE simbolo = ?", (simbolo,)).fetchone()
+        return dict(zip(('nome', 'setor', 'mercado'), linha)) if linha else {}
+
+    def salvar_cotacao(self, simbolo, resultado, validade):
+        """Compartilhar a cotação com os outros processos por `validade` segundos"""
+        with self._trava, self._conexao:
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO cotacoes (simbolo, resultado, expira_em) VALUES (?, ?, ?)",
+                (simbolo, json.dumps(resultado, default=str), time.time() + validade))
+
+    def carregar_cotacao(self, simbolo):
+        """Cotação ainda válida e os segundos que lhe restam, ou None"""
+        with self._trava:
+            linha = self._conexao.execute(
+                "SELECT resultado, expira_em FROM cotacoes WHERE simbolo = ? AND expira_em > ?",
+                (simbolo, time.time())).fetchone()
+        return (json.loads(linha[0]), linha[1] - time.time()) if linha else None
+
+    def salvar_fundamentos(self, simbolo, fundamentos, data_resultados=None):
+        """Gravar os fundamentos, cada campo com sua própria validade"""
+        agora = datetime.now()
+        linhas = []
+        for campo, valor in fundamentos.items():
+            expira = somar_dias_uteis(agora, VALIDADE_FUNDAMENTOS.get(campo, 1))
+            if campo in CAMPOS_DE_BALANCO and data_resultados and agora < data_resultados < expira:
+                expira = data_resultados
+            linhas.append((simbolo, campo, valor, expira.timestamp()))
+        with self._trava, self._conexao:
+            self._conexao.executemany(
+                "INSERT OR REPLACE INTO fundamentos (simbolo, campo, valor, expira_em) VALUES (?, ?, ?, ?)",
+                linhas)
+
+    def carregar_fundamentos(self, simbolo, incluir_vencidos=False):
+        """Campos ainda dentro da validade (ou todos, com incluir_vencidos)"""
+        with self._trava:
+            linhas = self._conexao.execute(
+                "SELECT campo, valor FROM fundamentos WHERE simbolo = ? AND expira_em > ?",
+                (simbolo, 0 if incluir_vencidos else time.time())).fetchall()
+        return dict(linhas)
+
+    def fechar(self):
+        with self._trava:
+            self._conexao.close()
+
+
+class SessaoSimbolo:
+    """Dados brutos de uma ação compartilhados pelas etapas de uma análise"""
+
+    def __init__(self, simbolo):
+        self.simbolo = simbolo
+        self.ticker = None       # yf.Ticker reaproveitado entre as etapas
+        self.info = None         # ticker.info (a chamada mais lenta do yfinance)
+        self.historico = None    # Barras diárias já completadas pelo armazém
+        self.fundamentos = None  # Resultado de buscar_dados_fundamentalistas
+        self.trava = threading.Lock()
+
+
+class GravadorRede:
+    """Gravação e reprodução das respostas de rede (chart, quoteSummary e yfinance)
+
+    Modo escolhido por ANALISADOR_REDE ('gravar' ou 'reproduzir') e arquivo por
+    ANALISADOR_ARQUIVO; reproduzindo, nenhuma chamada sai para a rede.
+    """
+
+    # Parâmetros que mudam a cada execução e não identificam a resposta
+    PARAMETROS_VOLATEIS = ('period1', 'period2')
+
+    def __init__(self, modo=None, arquivo=None):
+        self.modo = modo if modo is not None else os.environ.get('ANALISADOR_REDE', '')
+        self.arquivo = arquivo or os.environ.get('ANALISADOR_ARQUIVO') or \
+            os.path.join(DIRETORIO_DADOS, 'gravacao.json.gz')
+        self._trava = threading.Lock()
+        self._registros = {}
+        if self.reproduzindo:
+            with gzip.open(self.arquivo, 'rt', encoding='utf-8') as arquivo:
+                self._registros = json.load(arquivo)
+
+    @property
+    def gravando(self):
+        return self.modo == 'gravar'
+
+    @property
+    def reproduzindo(self):
+        return self.modo == 'reproduzir'
+
+    def chave_http(self, url):
+        """Chave sem host (query1/query2) e sem o intervalo de datas"""
+        partes = urllib.parse.urlsplit(url)
+        consulta = [(nome, valor) for nome, valor in urllib.parse.parse_qsl(partes.query)
+                    if nome not in self.PARAMETROS_VOLATEIS]
+        return f"http {partes.path}?{urllib.parse.urlencode(consulta)}"
+
+    def gravar_resposta(self, url, resposta):
+        if self.gravando:
+            self.gravar(self.chave_http(url), {
+                'status': resposta.status,
+                'motivo': resposta.reason,
+                'cabecalhos': dict(resposta.cabecalhos.items()),
+                'corpo': base64.b64encode(resposta.corpo).decode('ascii')
+            })
+
+    def reproduzir_resposta(self, url):
+        registro = self._registros.get(self.chave_http(url))
+        if registro is None:
+            raise urllib.error.HTTPError(url, 404, "Resposta não gravada", {}, None)
+        return RespostaHTTP(registro['status'], registro['motivo'], registro['cabecalhos'],
+                            base64.b64decode(registro['corpo']))
+
+    def chamar(self, chave, funcao):
+        """Executar funcao() gravando o resultado, ou devolver o que foi gravado"""
+        if self.reproduzindo:
+            return self.reproduzir(chave)
+        valor = funcao()
+        if self.gravando:
+            self.gravar(chave, valor)
+        return valor
+
+    def reproduzir(self, chave):
+        if chave not in self._registros:
+            # Na gravação a fonte não respondeu (ou não estava instalada)
+            raise ImportError(f"Sem gravação para {chave}")
+        return self._registros[chave]
+
+    def gravar(self, chave, valor):
+        with self._trava:
+            # Passar por JSON já na gravação: a reprodução devolve exatamente o mesmo
+            self._registros[chave] = json.loads(json.dumps(valor, default=str))
+
+    def salvar(self):
+        if not self.gravando:
+            return
+        os.makedirs(os.path.dirname(self.arquivo) or '.', exist_ok=True)
+        with self._trava, gzip.open(self.arquivo, 'wt', encoding='utf-8') as arquivo:
+            json.dump(self._registros, arquivo, separators=(',', ':'))
+
+
+class MotorDados:
+    """Motor de aquisição de dados: um único event loop para todas as fontes"""
+
+    # Hosts equivalentes da API do Yahoo, usados nos hedges
+    HOSTS_ESPELHO = {
+        'query1.finance.yahoo.com': 'query2.finance.yahoo.com',
+        'query2.finance.yahoo.com': 'query1.finance.yahoo.com',
+    }
+
+    # Diferença relativa no fechamento de uma barra já guardada que indica histórico revisado
+    TOLERANCIA_REVISAO = 0.001
+
+    def __init__(self, max_trabalhadores=8, tamanho_pool=4, tempo_ocioso=30.0, taxa_requisicoes=5.0,
+                 hedge_ativo=True, percentil_hedge=0.95, caminho_cache=None,
+                 ttl_cotacoes=60.0, ttl_fundamentos=3600.0, capacidade_cache=256,
+                 modo_rede=None, arquivo_gravacao=None):
+        # yfinance é bloqueante: roda em threads, limitado por max_trabalhadores
+        self.executor = ThreadPoolExecutor(max_workers=max_trabalhadores)
+        self.cliente = ClienteHTTP(tamanho_pool=tamanho_pool, tempo_ocioso=tempo_ocioso)
+
+        # Toda chamada externa (chart, quoteSummary e yfinance) passa pelo limitador
+        self.limitador = LimitadorTaxa(taxa=taxa_requisicoes, rajada=2 * max_trabalhadores,
+                                       concorrencia_maxima=2 * max_trabalhadores)
+
+        # Retentativas e disjuntor independentes para cada fonte
+        self.politicas = {
+            'yfinance': PoliticaRetentativa(tentativas=2, espera_base=1.0),
+            'yahoo_chart': PoliticaRetentativa(tentativas=3, espera_base=0.5),
+            'yahoo_quotesummary': PoliticaRetentativa(tentativas=3, espera_base=0.5),
+        }
+        self.disjuntores = {fonte: DisjuntorCircuito(fonte) for fonte in self.politicas}
+
+        # Buscas simultâneas da mesma ação (lote, gráfico, outra análise) viram uma só
+        self.coalescedor = CoalescedorRequisicoes()
+
+        # Resultados recentes reaproveitados entre análises e gráficos sem ir à rede
+        self.cache_cotacoes = CacheTTL(ttl_cotacoes, capacidade_cache)
+        self.cache_fundamentos = CacheTTL(ttl_fundamentos, capacidade_cache)
+
+        # Fora do pregão a cotação só muda na próxima abertura
+        self.calendario = CALENDARIO_B3
+
+        # Requisição lenta além do percentil vira um hedge no host espelho
+        self.hedge_ativo = hedge_ativo
+        self.monitor_latencia = MonitorLatencia(percentil=percentil_hedge)
+        self.estatisticas_hedge = {'requisicoes': 0, 'disparados': 0, 'vencidos_pelo_espelho': 0}
+
+        # Gravação/reprodução do tráfego de rede para medições repetíveis
+        self.gravador = GravadorRede(modo_rede, arquivo_gravacao)
+        if self.gravador.reproduzindo and caminho_cache is None:
+            # Reprodução parte sempre do zero, sem o cache persistente da máquina
+            caminho_cache = ':memory:'
+
+        # Histórico local: cada análise só baixa os pregões depois da última barra guardada
+        self.armazem = ArmazemBarras(caminho_cache or os.path.join(DIRETORIO_DADOS, 'cache.sqlite3'))
+        # SQLite bloqueia (e, com outros processos no arquivo, pode esperar o busy_timeout):
+        # as corrotinas falam com o armazém por esta thread, nunca direto do loop
+        self.executor_armazem = ThreadPoolExecutor(max_workers=1, thread_name_prefix="armazem")
+        self.dias_historico = 5  # Pregões incluídos no histórico do resultado
+        self.pregoes_analise = 60  # Pregões guardados sobre os quais a análise calcula os indicadores
+
+        # Contexto por ação da análise atual (info, histórico e fundamentos)
+        self.sessoes = {}
+        self.trava_sessoes = threading.Lock()
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._rodar_loop, name="MotorDados", daemon=True)
+        self._thread.start()
+
+    def _rodar_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def agendar(self, corrotina):
+        """Agendar uma corrotina no loop do motor e devolver um Future"""
+        return asyncio.run_coroutine_threadsafe(corrotina, self.loop)
+
+    def executar(self, corrotina):
+        """Executar uma corrotina no loop do motor e aguardar o resultado"""
+        if threading.current_thread() is self._thread:
+            corrotina.close()
+            raise RuntimeError("executar() não pode ser chamado de dentro do loop do motor")
+        return self.agendar(corrotina).result()
+
+    def encerrar(self):
+        """Fechar conexões, parar o loop e liberar as threads"""
+        if not self.loop.is_running():
+            return
+        self.loop.call_soon_threadsafe(self.cliente.fechar)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+        self.executor.shutdown(wait=False)
+        self.executor_armazem.shutdown(wait=True)
+        self.armazem.fechar()
+        self.gravador.salvar()
+
+    async def com_resiliencia(self, fonte, fabrica):
+        """Executar fabrica() com a política de retentativa e o disjuntor da fonte"""
+        politica = self.politicas[fonte]
+        disjuntor = self.disjuntores[fonte]
+
+        for tentativa in range(politica.tentativas):
+            disjuntor.verificar()
+            try:
+                resultado = await fabrica()
+            except Exception as e:
+                if eh_sobrecarga(e):
+                    # O limitador já repetiu e pausou: 429 não conta como falha da fonte
+                    disjuntor.liberar_teste()
+                    raise
+                if not eh_transitorio(e):
+                    # A fonte respondeu (404, dados inválidos, sem yfinance...): não é falha dela
+                    disjuntor.registrar_sucesso()
+                    raise
+                disjuntor.registrar_falha()
+                if tentativa == politica.tentativas - 1:
+                    raise
+                await asyncio.sleep(politica.espera(tentativa))
+            else:
+                disjuntor.registrar_sucesso()
+                return resultado
+
+    async def em_thread(self, funcao, *args):
+        """Rodar uma função bloqueante (yfinance) no executor do motor"""
+        if self.gravador.reproduzindo:
+            # Reprodução não vai à rede: sem limitador nem retentativas, como em requisitar
+            return await self.loop.run_in_executor(self.executor, funcao, *args)
+        return await self.com_resiliencia('yfinance', lambda: self.limitador.executar(
+            lambda: self.loop.run_in_executor(self.executor, funcao, *args)))
+
+    async def no_armazem(self, funcao, *args):
+        """Rodar uma função que usa o armazém (SQLite) fora do loop do motor"""
+        return await self.loop.run_in_executor(self.executor_armazem, funcao, *args)
+
+    async def requisitar(self, fonte, url, cabecalhos, timeout, revalidar=False):
+        """Fazer um GET pelo cliente HTTP, respeitando limitador e disjuntor"""
+        if self.gravador.reproduzindo:
+            return self.gravador.reproduzir_resposta(url)
+        resposta = await self.com_resiliencia(fonte, lambda: self.limitador.executar(
+            lambda: self._obter_com_hedge(url, cabecalhos, timeout, revalidar)))
+        self.gravador.gravar_resposta(url, resposta)
+        return resposta
+
+    async def _obter_medindo(self, url, cabecalhos, timeout, revalidar=False):
+        inicio = time.monotonic()
+        try:
+            return await self.cliente.obter(url, cabecalhos, timeout=timeout, revalidar=revalidar)
+        finally:
+            # Falhas e requisições canceladas pelo hedge também entram, pelo tempo que já levaram:
+            # sem elas a cauda lenta some da amostra e o limiar só cai
+            self.monitor_latencia.registrar(urllib.parse.urlsplit(url).hostname, time.monotonic() - inicio)
+
+    async def _obter_com_hedge(self, url, cabecalhos, timeout, revalidar=False):
+        """GET que, passado o percentil de latência, repete no host espelho e fica com o primeiro"""
+        self.estatisticas_hedge['requisicoes'] += 1
+        partes = urllib.parse.urlsplit(url)
+        espelho = self.HOSTS_ESPELHO.get(partes.hostname)
+        if not self.hedge_ativo or espelho is None:
+            return await self._obter_medindo(url, cabecalhos, timeout, revalidar)
+
+        principal = asyncio.ensure_future(self._obter_medindo(url, cabecalhos, timeout, revalidar))
+        tarefas = {principal}
+        try:
+            await asyncio.wait(tarefas, timeout=self.monitor_latencia.limiar(partes.hostname))
+            if principal.done():
+                return principal.result()
+
+            self.estatisticas_hedge['disparados'] += 1
+            netloc = espelho + (f":{partes.port}" if partes.port else '')
+            url_espelho = urllib.parse.urlunsplit(partes._replace(netloc=netloc))
+            espelhada = asyncio.ensure_future(self._obter_medindo(url_espelho, cabecalhos, timeout, revalidar))
+            tarefas.add(espelhada)
+
+            pendentes = set(tarefas)
+            while pendentes:
+                feitas, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+                for tarefa in feitas:
+                    if tarefa.exception() is None:
+                        if tarefa is espelhada:
+                            self.estatisticas_hedge['vencidos_pelo_espelho'] += 1
+                        return tarefa.result()
+
+            # As duas falharam: vale o erro do host original
+            return principal.result()
+        finally:
+            for tarefa in tarefas:
+                if not tarefa.done():
+                    tarefa.cancel()
+
+    def nova_analise(self):
+        """Descartar o contexto da análise anterior"""
+        with self.trava_sessoes:
+            self.sessoes = {}
+
+    def obter_sessao(self, simbolo):
+        """Obter (ou criar) o contexto compartilhado de uma ação"""
+        with self.trava_sessoes:
+            sessao = self.sessoes.get(simbolo)
+            if sessao is None:
+                sessao = SessaoSimbolo(simbolo)
+                self.sessoes[simbolo] = sessao
+            return sessao
+
+    def obter_ticker(self, sessao):
+        """Criar o yf.Ticker da sessão na primeira vez"""
+        import yfinance as yf
+
+        if sessao.ticker is None:
+            sessao.ticker = yf.Ticker(f"{sessao.simbolo}.SA")
+        return sessao.ticker
+
+    def obter_info_yfinance(self, sessao):
+        """Buscar ticker.info uma única vez por sessão (bloqueante)"""
+        with sessao.trava:
+            if sessao.info is None:
+                sessao.info = self.gravador.chamar(f"yfinance info {sessao.simbolo}",
+                                                   lambda: self.obter_ticker(sessao).info or {})
+            return sessao.info
+
+    def historico_revisado(self, conferencia, barras):
+        """Se a barra de conferência voltou com outro fechamento (desdobramento, ajuste de proventos)"""
+        if conferencia is None:
+            return False
+        for barra in barras:
+            if barra['data'] == conferencia['data']:
+                return abs(barra['fechamento'] / conferencia['fechamento'] - 1) > self.TOLERANCIA_REVISAO
+        return False
+
+    def marcos_historico(self, simbolo):
+        """Penúltima e primeira barra guardadas, que orientam o download incremental: (conferencia, primeira)"""
+        conferencia = self.armazem.barra_conferencia(simbolo)
+        return conferencia, self.armazem.primeira_barra(simbolo) if conferencia else None
+
+    def _historico_yfinance(self, sessao, conferencia, primeira):
+        """Barras novas da ação pelo yfinance e se substituem o histórico guardado (bloqueante, só rede)"""
+        ticker = self.obter_ticker(sessao)
+        if conferencia is None:
+            return self.barras_de_dataframe(ticker.history(period="5d")), False
+
+        # Só o que falta desde a penúltima barra guardada: a última pode ter sido parcial,
+        # a penúltima já fechou e mostra se o Yahoo revisou o histórico
+        barras = self.barras_de_dataframe(ticker.history(start=conferencia['data'], interval="1d"))
+        if not self.historico_revisado(conferencia, barras):
+            return barras, False
+
+        # Histórico revisado: todo o período guardado é baixado de novo
+        return self.barras_de_dataframe(ticker.history(start=primeira['data'], interval="1d")), True
+
+    def _buscar_yfinance(self, sessao, marcos):
+        """Info e barras novas da ação pelo yfinance (bloqueante, só rede): (info, barras, substituir)
+
+        Com o histórico da sessão já completo só a info é buscada e as barras vêm None.
+        """
+        info = self.obter_info_yfinance(sessao)
+        if sessao.historico is not None:
+            return info, None, False
+        barras, substituir = self.gravador.chamar(f"yfinance historico {sessao.simbolo}",
+                                                  lambda: self._historico_yfinance(sessao, *marcos))
+        return info, barras, substituir
+
+    def _guardar_yfinance(self, simbolo, info, barras_novas, substituir):
+        """Guardar o que veio do yfinance e montar a cotação (roda na thread do armazém)"""
+        sessao = self.obter_sessao(simbolo)
+        if barras_novas is not None:
+            self.armazem.salvar(simbolo, barras_novas, substituir)
+            sessao.historico = self.armazem.carregar(simbolo, self.dias_historico)
+        barras = sessao.historico
+
+        if not barras:
+            raise Exception("Sem dados históricos disponíveis")
+
+        self.armazem.salvar_metadados(simbolo, info.get('longName'), info.get('sector'), info.get('market'))
+        return self.montar_resultado(simbolo, barras, 'Yahoo Finance (yfinance)',
+                                     info.get('longName', f"{simbolo} S.A."),
+                                     info.get('sector', 'N/A'), info.get('market', 'B3'))
+
+    async def _cotacao_yfinance(self, simbolo):
+        """Cotação pelo yfinance; a thread do yfinance só faz rede, o armazém fica antes e depois dela"""
+        sessao = self.obter_sessao(simbolo)
+        marcos = (None, None)
+        if sessao.historico is None:
+            marcos = await self.no_armazem(self.marcos_historico, simbolo)
+        info, barras, substituir = await self.em_thread(self._buscar_yfinance, sessao, marcos)
+        return await self.no_armazem(self._guardar_yfinance, simbolo, info, barras, substituir)
+
+    async def buscar_dados_yahoo_finance(self, simbolo):
+        """Buscar dados do Yahoo Finance via web scraping"""
+        simbolo = normalizar_simbolo(simbolo)
+        em_cache = await self.obter_cotacao_guardada(simbolo)
+        if em_cache is not None:
+            return em_cache
+        return await self.coalescedor.executar(
+            ('cotacao', simbolo), lambda: self._buscar_dados_yahoo_finance(simbolo))
+
+    async def _buscar_dados_yahoo_finance(self, simbolo):
+        resultado = await self._buscar_cotacao_remota(simbolo)
+        if resultado['sucesso']:
+            await self.no_armazem(self.guardar_cotacao, simbolo, resultado)
+        else:
+            # Sem rede: servir o histórico guardado, se houver
+            local = await self.no_armazem(self.resultado_local, simbolo)
+            if local:
+                return local
+        return resultado
+
+    async def _buscar_cotacao_remota(self, simbolo):
+        try:
+            # Tentar primeiro com yfinance se disponível
+            try:
+                return await self._cotacao_yfinance(simbolo)
+            except ImportError:
+                # Se yfinance não está disponível, usar método alternativo
+                return await self.buscar_dados_alternativos(simbolo)
+            except Exception as e:
+                if not isinstance(e, CircuitoAberto) and not eh_transitorio(e) and not eh_sobrecarga(e):
+                    raise
+                # yfinance fora do ar: tentar a API direta antes de desistir
+                resultado = await self.buscar_dados_alternativos(simbolo)
+                if resultado['sucesso']:
+                    return resultado
+                raise
+
+        except Exception as e:
+            return {
+                'sucesso': False,
+                'erro': str(e)
+            }
+
+    def barras_de_dataframe(self, hist):
+        """Converter o DataFrame do yfinance em barras diárias"""
+        barras = []
+        for data, row in hist.iterrows():
+            if row['Close'] != row['Close'] or row['Volume'] != row['Volume']:
+                continue  # NaN: pregão sem negociação
+            barras.append({
+                'data': data.strftime('%Y-%m-%d'),
+                'timestamp': int(data.timestamp()),
+                'abertura': float(row['Open']),
+                'maxima': float(row['High']),
+                'minima': float(row['Low']),
+                'fechamento': float(row['Close']),
+                'volume': int(row['Volume'])
+            })
+        return barras
+
+    def itens_historico(self, barras, arredondar=False):
+        """Barras diárias no formato do 'historico' do resultado (gráficos e indicadores)"""
+        def valor(preco):
+            return round(preco, 2) if arredondar else preco
+
+        historico = []
+        for barra in barras:
+            historico.append({
+                'data': datetime.strptime(barra['data'], '%Y-%m-%d').strftime('%d/%m'),
+                'preco': valor(barra['fechamento']),
+                'maxima': valor(barra['maxima']),
+                'minima': valor(barra['minima']),
+                'volume': int(barra['volume'])
+            })
+        return historico
+
+    def montar_resultado(self, simbolo, barras, fonte, nome, setor='N/A', mercado='B3', arredondar=False):
+        """Converter as barras diárias no dicionário de resultado"""
+        def valor(preco):
+            return round(preco, 2) if arredondar else preco
+
+        # Extrair dados
+        ultimo = barras[-1]
+        preco_atual = ultimo['fechamento']
+        preco_anterior = barras[-2]['fechamento'] if len(barras) > 1 else preco_atual
+
+        return {
+            'sucesso': True,
+            'fonte': fonte,
+            'nome': nome,
+            'simbolo': f"{simbolo}.SA",
+            'preco_atual': valor(preco_atual),
+            'preco_anterior': valor(preco_anterior),
+            'volume': int(ultimo['volume']),
+            'alta_dia': valor(ultimo['maxima']),
+            'baixa_dia': valor(ultimo['minima']),
+            'historico': self.itens_historico(barras, arredondar),
+            'ultima_barra': ultimo['timestamp'],
+            'setor': setor,
+            'mercado': mercado
+        }
+
+    def resultado_local(self, simbolo, fonte='Cache local (sem conexão)'):
+        """Montar o resultado só com o que está no armazém"""
+        barras = self.armazem.carregar(simbolo, self.dias_historico)
+        if not barras:
+            return None
+        meta = self.armazem.carregar_metadados(simbolo)
+        return self.montar_resultado(simbolo, barras, fonte,
+                                     meta.get('nome') or f"{simbolo} S.A.",
+                                     meta.get('setor') or 'N/A', meta.get('mercado') or 'B3')
+
+    def validade_cotacao(self):
+        """Segundos de cache de uma cotação buscada agora"""
+        return self.calendario.validade(self.cache_cotacoes.ttl)
+
+    def cotacao_guardada(self, simbolo):
+        """Cotação ainda válida em memória ou, fora do pregão, no armazém (sem ir à rede)"""
+        em_cache = self.cache_cotacoes.obter(simbolo)
+        if em_cache is not None:
+            return em_cache
+
+        # Buscada há pouco por outro processo (ou por este, antes de reiniciar)
+        compartilhada = self.armazem.carregar_cotacao(simbolo)
+        if compartilhada is not None:
+            resultado, restante = compartilhada
+            self.cache_cotacoes.guardar(simbolo, resultado, restante)
+            return resultado
+        if self.calendario.em_negociacao():
+            return None
+
+        # Histórico completado depois do último fechamento já tem o preço definitivo
+        atualizado = self.armazem.atualizado_em(simbolo)
+        if atualizado is None or atualizado < self.calendario.ultimo_fechamento().timestamp():
+            return None
+        resultado = self.resultado_local(simbolo, 'Cache local')
+        if resultado:
+            self.cache_cotacoes.guardar(simbolo, resultado, self.validade_cotacao())
+        return resultado
+
+    async def obter_cotacao_guardada(self, simbolo):
+        """cotacao_guardada para as corrotinas: a memória direto, o armazém pela thread dele"""
+        em_cache = self.cache_cotacoes.obter(simbolo)
+        if em_cache is not None:
+            return em_cache
+        return await self.no_armazem(self.cotacao_guardada, simbolo)
+
+    def guardar_cotacao(self, simbolo, resultado):
+        """Guardar uma cotação buscada agora, em memória e para os outros processos"""
+        validade = self.validade_cotacao()
+        self.cache_cotacoes.guardar(simbolo, resultado, validade)
+        self.armazem.salvar_cotacao(simbolo, resultado, validade)
+
+    def rsi_wilder(self, simbolo, periodo=14):
+        """RSI de Wilder da ação, avançando o estado guardado só pelas barras novas
+
+        O estado cobre até a penúltima barra: a última pode ser o pregão em
+        andamento e entra só como prévia, então cada atualização é O(1).
+        """
+        calculadora = self.armazem.carregar_estado_rsi(simbolo, periodo) or CalculadoraRSIWilder(periodo)
+        barras = self.armazem.carregar_apos(simbolo, calculadora.data)
+        if not barras:
+            return None
+
+        for barra in barras[:-1]:
+            calculadora.adicionar(barra['fechamento'], barra['data'])
+        if len(barras) > 1:
+            self.armazem.salvar_estado_rsi(simbolo, calculadora)
+        return calculadora.previa(barras[-1]['fechamento'])
+
+    def serie_rsi_wilder(self, simbolo, pontos, periodo=14):
+        """Últimos `pontos` valores do RSI de Wilder (None sem barras suficientes), o último igual a rsi_wilder"""
+        barras = self.armazem.carregar(simbolo)
+        if not barras:
+            return []
+        calculadora = CalculadoraRSIWilder(periodo)
+        serie = [calculadora.adicionar(barra['fechamento']) for barra in barras[:-1]]
+        serie.append(calculadora.previa(barras[-1]['fechamento']))
+        return serie[-pontos:]
+
+    def dados_anteriores(self, simbolo):
+        """Cotação e fundamentos guardados, mesmo vencidos, e a idade deles em segundos"""
+        atualizado = self.armazem.atualizado_em(simbolo)
+        resultado = self.resultado_local(simbolo, 'Cache local') if atualizado else None
+        if resultado is None:
+            return None
+        return resultado, self.armazem.carregar_fundamentos(simbolo, incluir_vencidos=True), time.time() - atualizado
+
+    def _separar_download(self, dados, simbolos):
+        """Separar o DataFrame do yf.download em um DataFrame por ação"""
+        separados = {}
+        for simbolo in simbolos:
+            ticker = f"{simbolo}.SA"
+            # Com group_by='ticker' as colunas vêm como (ticker, campo)
+            if getattr(dados.columns, 'nlevels', 1) > 1:
+                if ticker not in dados.columns.get_level_values(0):
+                    continue
+                separados[simbolo] = dados[ticker]
+            else:
+                separados[simbolo] = dados
+        return separados
+
+    def _download_yfinance(self, simbolos, marcos):
+        """Barras novas de várias ações com até três yf.download (bloqueante, só rede)
+
+        `marcos` traz, por ação, a penúltima e a primeira barra guardadas (ver marcos_historico).
+        Devolve, por ação, as barras e se elas substituem o histórico guardado.
+        """
+        import yfinance as yf
+
+        conferencias = {simbolo: marcos[simbolo][0] for simbolo in simbolos}
+        novos = [simbolo for simbolo in simbolos if not conferencias[simbolo]]
+        existentes = [simbolo for simbolo in simbolos if conferencias[simbolo]]
+
+        baixados = {}
+        try:
+            if novos:
+                dados = yf.download([f"{simbolo}.SA" for simbolo in novos], period="5d", group_by='ticker',
+                                    auto_adjust=True, progress=False, threads=True)
+                baixados.update(self._separar_download(dados, novos))
+            if existentes:
+                # Um único download a partir da penúltima barra guardada mais antiga entre as ações
+                inicio = min(conferencias[simbolo]['data'] for simbolo in existentes)
+                dados = yf.download([f"{simbolo}.SA" for simbolo in existentes], start=inicio, group_by='ticker',
+                                    auto_adjust=True, progress=False, threads=True)
+                baixados.update(self._separar_download(dados, existentes))
+        except Exception as e:
+            print(f"Erro no download em lote: {e}")
+
+        barras = {}
+        for simbolo, hist in baixados.items():
+            try:
+                barras[simbolo] = self.barras_de_dataframe(hist)
+            except Exception:
+                continue
+
+        # Histórico revisado (desdobramento, ajuste de proventos): todo o período guardado de novo
+        revisados = [simbolo for simbolo in existentes
+                     if simbolo in barras and self.historico_revisado(conferencias[simbolo], barras[simbolo])]
+        refeitos = set()
+        if revisados:
+            try:
+                inicio = min(marcos[simbolo][1]['data'] for simbolo in revisados)
+                dados = yf.download([f"{simbolo}.SA" for simbolo in revisados], start=inicio, group_by='ticker',
+                                    auto_adjust=True, progress=False, threads=True)
+                for simbolo, hist in self._separar_download(dados, revisados).items():
+                    barras[simbolo] = self.barras_de_dataframe(hist)
+                    refeitos.add(simbolo)
+            except Exception as e:
+                print(f"Erro ao baixar histórico revisado: {e}")
+        for simbolo in revisados:
+            if simbolo not in refeitos:
+                # Sem o histórico completo, melhor não misturar barras ajustadas com as antigas
+                del barras[simbolo]
+
+        resultado = {}
+        for simbolo, barras_novas in barras.items():
+            resultado[simbolo] = (barras_novas, simbolo in refeitos)
+            if self.gravador.gravando:
+                self.gravador.gravar(f"yfinance lote {simbolo}", resultado[simbolo])
+        return resultado
+
+    def _baixar_lote(self, simbolos, marcos):
+        """Barras novas de várias ações pelo download em lote, ou da gravação (bloqueante, só rede)"""
+        if not self.gravador.reproduzindo:
+            return self._download_yfinance(simbolos, marcos)
+        baixados = {}
+        for simbolo in simbolos:
+            try:
+                baixados[simbolo] = self.gravador.reproduzir(f"yfinance lote {simbolo}")
+            except ImportError:
+                continue
+        return baixados
+
+    def _guardar_lote(self, baixados):
+        """Guardar as barras do lote e montar as cotações (roda na thread do armazém)"""
+        resultados = {}
+        for simbolo, (barras_novas, substituir) in baixados.items():
+            try:
+                self.armazem.salvar(simbolo, barras_novas, substituir)
+                barras = self.armazem.carregar(simbolo, self.dias_historico)
+                if not barras:
+                    continue
+
+                sessao = self.obter_sessao(simbolo)
+                sessao.historico = barras
+                info = sessao.info or {}
+                meta = self.armazem.carregar_metadados(simbolo)
+                resultados[simbolo] = self.montar_resultado(
+                    simbolo, barras, 'Yahoo Finance (yfinance)',
+                    info.get('longName') or meta.get('nome') or f"{simbolo} S.A.",
+                    info.get('sector') or meta.get('setor') or 'N/A',
+                    info.get('market') or meta.get('mercado') or 'B3')
+            except Exception:
+                # Ação fica de fora do lote e é buscada individualmente
+                continue
+
+        for simbolo, resultado in resultados.items():
+            self.guardar_cotacao(simbolo, resultado)
+        return resultados
+
+    async def buscar_dados_lote(self, simbolos):
+        """Buscar cotações de várias ações em um único download do yfinance"""
+        # Ações ainda no cache ficam fora do download (uma ida só à thread do armazém)
+        guardadas = await self.no_armazem(lambda: {simbolo: self.cotacao_guardada(simbolo) for simbolo in simbolos})
+        resultados = {simbolo: cotacao for simbolo, cotacao in guardadas.items() if cotacao is not None}
+        faltantes = [simbolo for simbolo in simbolos if simbolo not in resultados]
+        if not faltantes:
+            return resultados
+
+        # O armazém é lido antes e gravado depois do download: a thread do yfinance só espera a rede
+        marcos = await self.no_armazem(lambda: {simbolo: self.marcos_historico(simbolo) for simbolo in faltantes})
+        try:
+            baixados = await self.em_thread(self._baixar_lote, faltantes, marcos)
+        except ImportError:
+            # Sem yfinance cada ação segue pelo método alternativo individual
+            return resultados
+        resultados.update(await self.no_armazem(self._guardar_lote, baixados))
+        return resultados
+
+    async def buscar_dados_alternativos(self, simbolo):
+        """Método alternativo usando APIs públicas"""
+        simbolo = normalizar_simbolo(simbolo)
+        em_cache = await self.obter_cotacao_guardada(simbolo)
+        if em_cache is not None:
+            return em_cache
+        resultado = await self.coalescedor.executar(
+            ('alternativo', simbolo), lambda: self._buscar_dados_alternativos(simbolo))
+        if resultado['sucesso']:
+            await self.no_armazem(self.guardar_cotacao, simbolo, resultado)
+        return resultado
+
+    async def _barras_chart(self, simbolo, inicio=None):
+        """Barras do endpoint chart a partir da barra `inicio` (ou o padrão do Yahoo): (erro, meta, barras)"""
+        url = f"https://query1.finance.yahoo.com/v8/finance/chart/{simbolo}.SA"
+        if inicio:
+            # period2 no fim do dia mantém a URL estável para a revalidação condicional
+            fim_do_dia = (int(time.time()) // 86400 + 1) * 86400
+            url += f"?period1={inicio['timestamp']}&period2={fim_do_dia}&interval=1d"
+
+        # Headers atualizados para simular um navegador moderno
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0.0.0 Safari/537.36',
+            'Accept': 'application/json',
+            'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
+            'Connection': 'keep-alive',
+            'Referer': f'https://finance.yahoo.com/quote/{simbolo}.SA',
+            'Sec-Fetch-Dest': 'empty',
+            'Sec-Fetch-Mode': 'cors',
+            'Sec-Fetch-Site': 'same-site'
+        }
+
+        # Aumentar timeout para 15 segundos
+        response = await self.requisitar('yahoo_chart', url, headers, timeout=15, revalidar=True)
+        if response.status != 200:
+            return f"Erro HTTP {response.status}: {response.reason}", None, None
+
+        data = response.json()
+
+        # Verificar se a resposta contém dados válidos
+        if 'chart' not in data or not data['chart']['result']:
+            return "Resposta da API sem dados válidos", None, None
+
+        result = data['chart']['result'][0]
+        meta = result['meta']
+
+        # Extrair preços com tratamento de dados ausentes
+        timestamps = result.get('timestamp', [])
+        quote = result['indicators']['quote'][0]
+        precos = quote.get('close', [])
+        volumes = quote.get('volume', [])
+        altas = quote.get('high', [])
+        baixas = quote.get('low', [])
+        aberturas = quote.get('open', [])
+
+        # Fuso da bolsa para datar as barras no dia do pregão
+        fuso = timezone(timedelta(seconds=meta.get('gmtoffset') or 0))
+
+        # Filtrar valores None e criar lista de barras válidas
+        barras = []
+        for i in range(len(timestamps)):
+            # Pular se preço ou volume forem nulos
+            if precos[i] is None or volumes[i] is None:
+                continue
+
+            barras.append({
+                'data': datetime.fromtimestamp(timestamps[i], fuso).strftime('%Y-%m-%d'),
+                'timestamp': int(timestamps[i]),
+                'abertura': aberturas[i] if i < len(aberturas) and aberturas[i] is not None else precos[i],
+                'maxima': altas[i] if i < len(altas) and altas[i] is not None else precos[i],
+                'minima': baixas[i] if i < len(baixas) and baixas[i] is not None else precos[i],
+                'fechamento': precos[i],
+                'volume': int(volumes[i])
+            })
+        return None, meta, barras
+
+    def _guardar_chart(self, simbolo, meta, barras, substituir):
+        """Gravar as barras do endpoint chart e montar o resultado a partir do armazém (bloqueante)"""
+        self.armazem.salvar(simbolo, barras, substituir)
+        self.armazem.salvar_metadados(simbolo, meta.get('shortName'))
+        barras = self.armazem.carregar(simbolo, self.dias_historico)
+        if not barras:
+            return {'sucesso': False, 'erro': "Dados de preços não disponíveis"}
+
+        meta_local = self.armazem.carregar_metadados(simbolo)
+        return self.montar_resultado(simbolo, barras, 'Yahoo Finance API',
+                                     meta.get('shortName') or meta_local.get('nome') or f"{simbolo} S.A.",
+                                     meta_local.get('setor') or 'N/A', arredondar=True)
+
+    async def _buscar_dados_alternativos(self, simbolo):
+        try:
+            # Tentar buscar da API do Yahoo Finance diretamente.
+            # Só o intervalo desde a penúltima barra guardada: a última pode ter sido
+            # parcial, a penúltima já fechou e mostra se o Yahoo revisou o histórico
+            conferencia = await self.no_armazem(self.armazem.barra_conferencia, simbolo)
+            erro, meta, barras = await self._barras_chart(simbolo, conferencia)
+            if erro:
+                return {'sucesso': False, 'erro': erro}
+
+            substituir = self.historico_revisado(conferencia, barras)
+            if substituir:
+                # Desdobramento ou ajuste: todo o período guardado é baixado de novo
+                primeira = await self.no_armazem(self.armazem.primeira_barra, simbolo)
+                erro, meta, barras = await self._barras_chart(simbolo, primeira)
+                if erro:
+                    return {'sucesso': False, 'erro': erro}
+
+            return await self.no_armazem(self._guardar_chart, simbolo, meta, barras, substituir)
+
+        except CircuitoAberto as e:
+            return {'sucesso': False, 'erro': str(e)}
+        except urllib.error.HTTPError as e:
+            return {'sucesso': False, 'erro': f"Erro HTTP {e.code}: {e.reason}"}
+        except urllib.error.URLError as e:
+            return {'sucesso': False, 'erro': f"Erro de rede: {e.reason}"}
+        except socket.timeout:
+            return {'sucesso': False, 'erro': "Tempo limite de conexão excedido"}
+        except json.JSONDecodeError:
+            return {'sucesso': False, 'erro': "Resposta inválida da API"}
+        except Exception as e:
+            return {'sucesso': False, 'erro': f"Erro inesperado: {str(e)}"}
+
+    async def buscar_dados_fundamentalistas(self, simbolo, campos=None):
+        """Buscar dados fundamentalistas da ação
+
+        `campos` são os que o chamador usa: se todos estiverem guardados e válidos,
+        não há ida à rede mesmo que outros (ex.: os que vencem todo pregão) tenham vencido.
+        """
+        simbolo = normalizar_simbolo(simbolo)
+        campos = tuple(campos) if campos else None
+        em_cache = self.cache_fundamentos.obter(simbolo)
+        if em_cache is not None and cobre_campos(em_cache, campos):
+            return em_cache
+        fundamentos = await self.coalescedor.executar(
+            ('fundamentos', simbolo, campos), lambda: self._buscar_dados_fundamentalistas(simbolo, campos))
+        if fundamentos is not None:
+            self.cache_fundamentos.guardar(simbolo, fundamentos)
+        return fundamentos
+
+    async def _buscar_dados_fundamentalistas(self, simbolo, campos=None):
+        try:
+            # Reaproveitar o que já foi buscado nesta análise
+            sessao = self.obter_sessao(simbolo)
+            if sessao.fundamentos is not None and cobre_campos(sessao.fundamentos, campos):
+                return sessao.fundamentos
+
+            # Campos pedidos guardados e ainda válidos dispensam a rede
+            armazenados = await self.no_armazem(self.armazem.carregar_fundamentos, simbolo)
+            if cobre_campos(armazenados, campos):
+                sessao.fundamentos = armazenados
+                return sessao.fundamentos
+
+            # Tentar com yfinance se disponível
+            try:
+                info = await self.em_thread(self.obter_info_yfinance, sessao)
+
+                # Extrair dados fundamentalistas
+                dividends_per_share = info.get('dividendYield', 0)
+                earnings_per_share = info.get('trailingEps', 0)
+                payout_ratio = info.get('payoutRatio', 0)
+
+                sessao.fundamentos = {
+                    'dividendYield': dividends_per_share,
+                    'trailingEps': earnings_per_share,
+                    'payoutRatio': payout_ratio,
+                    'bookValue': info.get('bookValue', 0),
+                    'priceToBook': info.get('priceToBook', 0),
+                    'returnOnEquity': info.get('returnOnEquity', 0)
+                }
+                data_resultados = info.get('earningsTimestamp')
+
+            except Exception as e:
+                # Sem yfinance, ou yfinance fora do ar: método alternativo via API
+                if (not isinstance(e, (ImportError, CircuitoAberto)) and not eh_transitorio(e)
+                        and not eh_sobrecarga(e)):
+                    raise
+                url = f"https://query1.finance.yahoo.com/v10/finance/quoteSummary/{simbolo}.SA"
+                params = "?modules=defaultKeyStatistics,financialData,summaryDetail,calendarEvents"
+
+                headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+
+                data = (await self.requisitar('yahoo_quotesummary', url + params, headers, timeout=10,
+                                              revalidar=True)).json()
+
+                result = data.get('quoteSummary', {}).get('result', [])
+                if not result:
+                    return None
+
+                stats = result[0].get('defaultKeyStatistics', {})
+                financial = result[0].get('financialData', {})
+                summary = result[0].get('summaryDetail', {})
+                datas = result[0].get('calendarEvents', {}).get('earnings', {}).get('earningsDate', [])
+
+                sessao.fundamentos = {
+                    'dividendYield': summary.get('dividendYield', {}).get('raw', 0),
+                    'trailingEps': stats.get('trailingEps', {}).get('raw', 0),
+                    'payoutRatio': stats.get('payoutRatio', {}).get('raw', 0),
+                    'bookValue': stats.get('bookValue', {}).get('raw', 0),
+                    'priceToBook': stats.get('priceToBook', {}).get('raw', 0),
+                    'returnOnEquity': financial.get('returnOnEquity', {}).get('raw', 0)
+                }
+                data_resultados = datas[0].get('raw') if datas else None
+
+            # Balanço já marcado encurta a validade dos campos que dependem dele
+            await self.no_armazem(
+                self.armazem.salvar_fundamentos, simbolo, sessao.fundamentos,
+                datetime.fromtimestamp(data_resultados) if data_resultados else None)
+            return sessao.fundamentos
+
+        except Exception as e:
+            print(f"Erro ao buscar dados fundamentalistas: {e}")
+            return None
+
+    async def buscar_fundamentos_retencao(self, simbolo):
+        """Fundamentos para o Retention Ratio (da rede só se faltar o que ele usa)"""
+        fundamentos = await self.buscar_dados_fundamentalistas(simbolo, CAMPOS_RETENCAO)
+        if fundamentos and not fundamentos.get('payoutRatio') and 'dividendYield' not in fundamentos:
+            # Sem payout a estimativa usa o dividend yield, que vence todo pregão
+            fundamentos = await self.buscar_dados_fundamentalistas(simbolo)
+        return fundamentos
+
+    async def buscar_cotacao_e_fundamentos(self, simbolo, dados_acao=None):
+        """Buscar cotação (se ainda não veio do lote) e fundamentos de uma ação: (dados_acao, fundamentos)"""
+        if dados_acao is None:
+            dados_acao = await self.buscar_dados_yahoo_finance(simbolo)
+        fundamentos = None
+        if dados_acao.get('sucesso'):
+            fundamentos = await self.buscar_fundamentos_retencao(simbolo)
+        return dados_acao, fundamentos
+
+    def series_analise(self, simbolo):
+        """RSI de Wilder, a série dele e o histórico guardado em que a análise calcula os indicadores (bloqueante)"""
+        return {'rsi_wilder': self.rsi_wilder(simbolo),
+                'serie_rsi': self.serie_rsi_wilder(simbolo, self.pregoes_analise),
+                'historico': self.itens_historico(self.armazem.carregar(simbolo, self.pregoes_analise))}
+
+    async def preparar_analise(self, simbolo, dados_acao=None):
+        """Tudo o que a análise de uma ação usa, buscado aqui para a interface não fazer I/O
+
+        Devolve o contexto {'dados_acao', 'fundamentos'} mais o de series_analise.
+        """
+        dados_acao, fundamentos = await self.buscar_cotacao_e_fundamentos(simbolo, dados_acao)
+        contexto = {'dados_acao': dados_acao, 'fundamentos': fundamentos}
+        if dados_acao.get('sucesso'):
+            # A cotação traz só alguns pregões; os indicadores precisam de `pregoes_analise`
+            await self.completar_historico([simbolo], self.pregoes_analise)
+            contexto.update(await self.no_armazem(self.series_analise, simbolo))
+        return contexto
+
+    def contexto_guardado(self, simbolo):
+        """Contexto da análise só com dados guardados, mesmo vencidos, com a idade deles; None sem dados (bloqueante)"""
+        anteriores = self.dados_anteriores(simbolo)
+        if anteriores is None:
+            return None
+        dados_acao, fundamentos, idade = anteriores
+        contexto = {'dados_acao': dados_acao, 'fundamentos': fundamentos, 'idade': idade}
+        contexto.update(self.series_analise(simbolo))
+        return contexto
+
+    async def preparar_guardados(self, simbolos):
+        """contexto_guardado de várias ações, pela thread do armazém"""
+        return await self.no_armazem(lambda: [self.contexto_guardado(normalizar_simbolo(simbolo))
+                                              for simbolo in simbolos])
+
+    async def _preparar_apos_lote(self, simbolo, lote):
+        """preparar_analise assim que o download em lote (Future compartilhado) terminar"""
+        try:
+            cotacoes = await asyncio.wrap_future(lote)
+        except Exception:
+            # Lote falhou: a ação é buscada individualmente
+            cotacoes = {}
+        return await self.preparar_analise(simbolo, cotacoes.get(simbolo))
+
+    def agendar_lote(self, simbolos):
+        """Agendar a preparação da análise de várias ações: um Future por ação, na ordem de entrada
+
+        O download em lote roda uma vez e cada ação segue assim que ele termina,
+        sem que a thread chamadora precise esperar por nada.
+        """
+        simbolos = [normalizar_simbolo(simbolo) for simbolo in simbolos]
+        lote = self.agendar(self.buscar_lote_analise(simbolos))
+        return [self.agendar(self._preparar_apos_lote(simbolo, lote)) for simbolo in simbolos]
+
+    async def buscar_lote_analise(self, simbolos):
+        """Cotações do lote com o histórico da análise já completado, num download só para todas as ações"""
+        cotacoes = await self.buscar_dados_lote(simbolos)
+        await self.completar_historico(list(cotacoes), self.pregoes_analise)
+        return cotacoes
+
+    def matriz_fechamentos(self, simbolos, limite=250):
+        """Fechamentos do armazém alinhados por data (ações × datas, NaN onde falta pregão)"""
+        barras = {simbolo: self.armazem.carregar(simbolo, limite) for simbolo in simbolos}
+        datas = sorted({barra['data'] for lista in barras.values() for barra in lista})[-limite:]
+        indice = {data: i for i, data in enumerate(datas)}
+
+        matriz = [[float('nan')] * len(datas) for _ in simbolos]
+        for linha, simbolo in zip(matriz, simbolos):
+            for barra in barras[simbolo]:
+                if barra['data'] in indice:
+                    linha[indice[barra['data']]] = barra['fechamento']
+        return datas, matriz
+
+    def _download_historico(self, simbolos, inicio):
+        """Histórico desde `inicio` de várias ações num único yf.download (bloqueante)"""
+        if self.gravador.reproduzindo:
+            baixados = {}
+            for simbolo in simbolos:
+                try:
+                    baixados[simbolo] = self.gravador.reproduzir(f"yfinance historico longo {simbolo}")
+                except ImportError:
+                    continue
+            return baixados
+
+        import yfinance as yf
+
+        dados = yf.download([f"{simbolo}.SA" for simbolo in simbolos], start=inicio, group_by='ticker',
+                            auto_adjust=True, progress=False, threads=True)
+        baixados = {}
+        for simbolo, hist in self._separar_download(dados, simbolos).items():
+            try:
+                baixados[simbolo] = self.barras_de_dataframe(hist)
+            except Exception:
+                continue
+            if self.gravador.gravando:
+                self.gravador.gravar(f"yfinance historico longo {simbolo}", baixados[simbolo])
+        return baixados
+
+    async def completar_historico(self, simbolos, pregoes):
+        """Baixar de uma vez o histórico das ações com menos de `pregoes` barras guardadas"""
+        inicio = self.calendario.inicio_pregoes(pregoes).isoformat()
+
+        def conferir():
+            contagens, curtos = {}, []
+            for simbolo in simbolos:
+                contagens[simbolo] = self.armazem.contar_barras(simbolo)
+                primeira = self.armazem.primeira_barra(simbolo)
+                # Menos barras mas a janela já coberta (ação suspensa por uns dias): nada a baixar
+                if contagens[simbolo] < pregoes and (primeira is None or primeira['data'] > inicio):
+                    curtos.append(simbolo)
+            return contagens, curtos
+
+        contagens, curtos = await self.no_armazem(conferir)
+        if not curtos:
+            return
+
+        try:
+            baixados = await self.em_thread(self._download_historico, curtos, inicio)
+        except ImportError:
+            # Sem yfinance os indicadores usam o histórico que já estiver guardado
+            return
+        except Exception as e:
+            print(f"Erro ao baixar histórico: {e}")
+            return
+
+        def guardar():
+            for simbolo, barras in baixados.items():
+                # Uma série só, da mesma fonte e com o mesmo ajuste, no lugar das barras curtas
+                if len(barras) >= contagens[simbolo]:
+                    self.armazem.salvar(simbolo, barras, substituir=True)
+        await self.no_armazem(guardar)
+
+    async def indicadores_universo(self, simbolos, limite=250):
+        """Completar o histórico de várias ações e calcular RSI, médias, retornos e volatilidade de todas juntas"""
+        simbolos = list(dict.fromkeys(normalizar_simbolo(simbolo) for simbolo in simbolos))
+        await self.buscar_dados_lote(simbolos)
+        # O lote só traz alguns pregões para ações novas: os indicadores precisam de `limite`
+        await self.completar_historico(simbolos, limite)
+        datas, matriz = await self.no_armazem(self.matriz_fechamentos, simbolos, limite)
+        indicadores = calcular_indicadores_matriz(matriz)
+        indicadores.update({'simbolos': simbolos, 'datas': datas})
+        return indicadores
+
+    async def buscar_lote(self, simbolos):
+        """Contexto da análise (preparar_analise) de várias ações, na ordem de entrada
+
+        Ponto de entrada em lote sem interface: motor.executar(motor.buscar_lote(simbolos)).
+        """
+        simbolos = [normalizar_simbolo(simbolo) for simbolo in simbolos]
+        lote = self.agendar(self.buscar_lote_analise(simbolos))
+        return await asyncio.gather(*(self._preparar_apos_lote(simbolo, lote) for simbolo in simbolos))
+
+
+class Indicador:
+    """Indicador técnico registrado: colunas que usa, janelas padrão e a função de cálculo"""
+
+    def __init__(self, nome, entradas, janelas, calcular):
+        self.nome = nome
+        self.entradas = entradas
+        self.janelas = janelas
+        self.calcular = calcular
+
+
+class PassadaIndicadores:
+    """Etapas intermediárias (somas acumuladas, EMAs, variações) de um cálculo de indicadores
+
+    Cada etapa é calculada uma única vez e compartilhada entre os indicadores pedidos:
+    MM20 e Bollinger usam a mesma soma acumulada, MACD e EMA as mesmas médias exponenciais.
+    """
+
+    def __init__(self, colunas):
+        self.colunas = colunas
+        self.tamanho = len(colunas['fechamento'])
+        self._etapas = {}
+
+    def etapa(self, chave, calcular):
+        if chave not in self._etapas:
+            self._etapas[chave] = calcular()
+        return self._etapas[chave]
+
+    def variacoes(self, coluna):
+        """Diferença entre valores consecutivos (tamanho n - 1)"""
+        def calcular():
+            valores = self.colunas[coluna]
+            if np is not None:
+                return np.diff(np.asarray(valores, dtype=float))
+            return [atual - anterior for anterior, atual in zip(valores, valores[1:])]
+        return self.etapa(('variacoes', coluna), calcular)
+
+    def acumulado(self, chave, valores):
+        """Soma acumulada com zero na frente: soma de [i, j) é acumulado[j] - acumulado[i]"""
+        def calcular():
+            if np is not None:
+                return np.concatenate(([0.0], np.cumsum(np.asarray(valores, dtype=float))))
+            acumulado = [0.0]
+            for valor in valores:
+                acumulado.append(acumulado[-1] + valor)
+            return acumulado
+        return self.etapa(('acumulado', chave), calcular)
+
+    def somas_janela(self, chave, valores, janela):
+        """Soma de cada janela completa de `valores` (tamanho len - janela + 1)"""
+        acumulado = self.acumulado(chave, valores)
+        if np is not None:
+            return acumulado[janela:] - acumulado[:-janela]
+        return [acumulado[i] - acumulado[i - janela] for i in range(janela, len(acumulado))]
+
+    def media_movel(self, coluna, janela):
+        """Média móvel simples (None onde a janela não está completa)"""
+        def calcular():
+            if self.tamanho < janela:
+                return [None] * self.tamanho
+            somas = self.somas_janela(coluna, self.colunas[coluna], janela)
+            return [None] * (janela - 1) + [soma / janela for soma in somas]
+        return self.etapa(('media_movel', coluna, janela), calcular)
+
+    def desvio_movel(self, coluna, janela):
+        """Desvio padrão populacional móvel, pelas somas acumuladas de x e x²"""
+        def calcular():
+            if self.tamanho < janela:
+                return [None] * self.tamanho
+            valores = self.colunas[coluna]
+            quadrados = np.square(np.asarray(valores, dtype=float)) if np is not None else [v * v for v in valores]
+            somas = self.somas_janela(coluna, valores, janela)
+            somas_quadrados = self.somas_janela(('quadrados', coluna), quadrados, janela)
+            desvios = [max(0.0, sq / janela - (soma / janela) ** 2) ** 0.5
+                       for soma, sq in zip(somas, somas_quadrados)]
+            return [None] * (janela - 1) + desvios
+        return self.etapa(('desvio_movel', coluna, janela), calcular)
+
+    def ema(self, coluna, janela):
+        """Média móvel exponencial, iniciada pela média simples da primeira janela"""
+        return self.etapa(('ema', coluna, janela), lambda: media_exponencial(self.colunas[coluna], janela))
+
+    def faixa_verdadeira(self):
+        """True range: maior entre máxima - mínima e a distância ao fechamento anterior"""
+        def calcular():
+            maximas, minimas, fechamentos = (self.colunas[c] for c in ('maxima', 'minima', 'fechamento'))
+            faixas = [maximas[0] - minimas[0]] if self.tamanho else []
+            for i in range(1, self.tamanho):
+                faixas.append(max(maximas[i] - minimas[i], abs(maximas[i] - fechamentos[i - 1]),
+                                  abs(minimas[i] - fechamentos[i - 1])))
+            return faixas
+        return self.etapa(('faixa_verdadeira',), calcular)
+
+
+def media_exponencial(valores, janela):
+    """EMA de uma série que pode começar com None, iniciada pela média simples da primeira janela"""
+    inicio = next((i for i, valor in enumerate(valores) if valor is not None), len(valores))
+    if len(valores) - inicio < janela:
+        return [None] * len(valores)
+
+    alfa = 2 / (janela + 1)
+    media = sum(valores[inicio:inicio + janela]) / janela
+    serie = [None] * (inicio + janela - 1) + [media]
+    for valor in valores[inicio + janela:]:
+        media += alfa * (valor - media)
+        serie.append(media)
+    return serie
+
+
+class MotorIndicadores:
+    """Calcula um conjunto de indicadores sobre colunas OHLCV numa passada compartilhada"""
+
+    registro = {}  # nome -> Indicador
+
+    @classmethod
+    def registrar(cls, nome, entradas, janelas=None):
+        """Decorador que registra um indicador (plugin)"""
+        def decorador(funcao):
+            cls.registro[nome] = Indicador(nome, tuple(entradas), dict(janelas or {}), funcao)
+            return funcao
+        return decorador
+
+    def calcular(self, colunas, pedidos):
+        """Calcular os indicadores pedidos
+
+        `pedidos` mapeia rótulo -> nome do indicador ou (nome, {parâmetro: valor});
+        devolve rótulo -> série (ou dicionário de séries) do tamanho das colunas.
+        """
+        passada = PassadaIndicadores(colunas)
+        resultados = {}
+        for rotulo, pedido in pedidos.items():
+            nome, parametros = (pedido, {}) if isinstance(pedido, str) else pedido
+            indicador = self.registro[nome]
+            faltantes = [coluna for coluna in indicador.entradas if coluna not in colunas]
+            if faltantes:
+                raise ValueError(f"Indicador {nome} precisa das colunas: {', '.join(faltantes)}")
+            resultados[rotulo] = indicador.calcular(passada, **dict(indicador.janelas, **parametros))
+        return resultados
+
+
+@MotorIndicadores.registrar('sma', entradas=('fechamento',), janelas={'janela': 20})
+def indicador_sma(passada, janela):
+    return passada.media_movel('fechamento', janela)
+
+
+@MotorIndicadores.registrar('ema', entradas=('fechamento',), janelas={'janela': 9})
+def indicador_ema(passada, janela):
+    return passada.ema('fechamento', janela)
+
+
+@MotorIndicadores.registrar('macd', entradas=('fechamento',), janelas={'rapida': 12, 'lenta': 26, 'sinal': 9})
+def indicador_macd(passada, rapida, lenta, sinal):
+    macd = [r - l if r is not None and l is not None else None
+            for r, l in zip(passada.ema('fechamento', rapida), passada.ema('fechamento', lenta))]
+    linha_sinal = media_exponencial(macd, sinal)
+    histograma = [m - s if m is not None and s is not None else None for m, s in zip(macd, linha_sinal)]
+    return {'macd': macd, 'sinal': linha_sinal, 'histograma': histograma}
+
+
+@MotorIndicadores.registrar('bollinger', entradas=('fechamento',), janelas={'janela': 20, 'desvios': 2})
+def indicador_bollinger(passada, janela, desvios):
+    media = passada.media_movel('fechamento', janela)
+    desvio = passada.desvio_movel('fechamento', janela)
+    return {
+        'media': media,
+        'superior': [m + desvios * d if m is not None else None for m, d in zip(media, desvio)],
+        'inferior': [m - desvios * d if m is not None else None for m, d in zip(media, desvio)]
+    }
+
+
+@MotorIndicadores.registrar('atr', entradas=('maxima', 'minima', 'fechamento'), janelas={'janela': 14})
+def indicador_atr(passada, janela):
+    # Suavização de Wilder sobre o true range
+    faixas = passada.faixa_verdadeira()
+    if len(faixas) < janela:
+        return [None] * len(faixas)
+    atr = sum(faixas[:janela]) / janela
+    serie = [None] * (janela - 1) + [atr]
+    for faixa in faixas[janela:]:
+        atr = (atr * (janela - 1) + faixa) / janela
+        serie.append(atr)
+    return serie
+
+
+@MotorIndicadores.registrar('obv', entradas=('fechamento', 'volume'))
+def indicador_obv(passada):
+    volumes = passada.colunas['volume']
+    obv = [0] if passada.tamanho else []
+    for variacao, volume in zip(passada.variacoes('fechamento'), volumes[1:]):
+        obv.append(obv[-1] + (volume if variacao > 0 else -volume if variacao < 0 else 0))
+    return obv
+
+
+@MotorIndicadores.registrar('rsi', entradas=('fechamento',), janelas={'janela': 14})
+def indicador_rsi(passada, janela):
+    # Mesma conta do calcular_rsi (média simples dos últimos `janela` ganhos e perdas);
+    # NaN onde não há dados suficientes
+    n = passada.tamanho
+    if n < janela + 1:
+        return [float('nan')] * n
+
+    mudancas = passada.variacoes('fechamento')
+    if np is not None:
+        soma_ganhos = passada.somas_janela('ganhos', np.clip(mudancas, 0, None), janela)
+        soma_perdas = passada.somas_janela('perdas', np.clip(-mudancas, 0, None), janela)
+        # Contagem exata de quedas: janela sem queda é RSI 100, sem erro de arredondamento
+        sem_quedas = passada.somas_janela('quedas', mudancas < 0, janela) == 0
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = 100 - 100 / (1 + soma_ganhos / soma_perdas)
+        return [float('nan')] * janela + np.round(np.where(sem_quedas, 100.0, rsi), 2).tolist()
+
+    soma_ganhos = passada.somas_janela('ganhos', [max(0, m) for m in mudancas], janela)
+    soma_perdas = passada.somas_janela('perdas', [max(0, -m) for m in mudancas], janela)
+    quedas = passada.somas_janela('quedas', [1 if m < 0 else 0 for m in mudancas], janela)
+    return [float('nan')] * janela + [
+        100.0 if queda == 0 else round(100 - (100 / (1 + ganho / perda)), 2)
+        for ganho, perda, queda in zip(soma_ganhos, soma_perdas, quedas)]
+
+
+# Indicadores calculados em cada análise (e exibidos no gráfico individual)
+INDICADORES_ANALISE = {
+    'mm9': ('sma', {'janela': 9}),
+    'mm20': ('sma', {'janela': 20}),
+    'rsi': 'rsi',
+    'ema9': 'ema',
+    'macd': 'macd',
+    'bollinger': 'bollinger',
+    'atr': 'atr',
+    'obv': 'obv'
+}
+
+
+# Pregões por ano, para anualizar a volatilidade
+PREGOES_POR_ANO = 252
+
+
+def _somas_janela_linha(valores, janela):
+    """Somas móveis de uma linha; NaN onde a janela não está completa ou tem NaN"""
+    somas = [float('nan')] * len(valores)
+    acumulado, validos = [0.0], [0]
+    for valor in valores:
+        valido = valor == valor
+        acumulado.append(acumulado[-1] + (valor if valido else 0.0))
+        validos.append(validos[-1] + valido)
+    for i in range(janela - 1, len(valores)):
+        if validos[i + 1] - validos[i + 1 - janela] == janela:
+            somas[i] = acumulado[i + 1] - acumulado[i + 1 - janela]
+    return somas
+
+
+def _somas_janela_matriz(matriz, janela):
+    """Somas móveis de cada linha da matriz; NaN onde a janela não está completa ou tem NaN"""
+    linhas, colunas = matriz.shape
+    somas = np.full((linhas, colunas), np.nan)
+    if colunas < janela:
+        return somas
+    validos = ~np.isnan(matriz)
+    zeros = np.zeros((linhas, 1))
+    acumulado = np.hstack((zeros, np.cumsum(np.where(validos, matriz, 0.0), axis=1)))
+    contagem = np.hstack((zeros, np.cumsum(validos, axis=1)))
+    completas = (contagem[:, janela:] - contagem[:, :-janela]) == janela
+    somas[:, janela - 1:] = np.where(completas, acumulado[:, janela:] - acumulado[:, :-janela], np.nan)
+    return somas
+
+
+def _rsi_wilder_matriz(precos, periodo):
+    """RSI de Wilder de cada linha, com as contas da CalculadoraRSIWilder
+
+    O laço é nas datas e cada passo vale para todas as ações. As datas sem pregão
+    (NaN) ficam de fora da conta da ação, como no histórico guardado dela.
+    """
+    linhas, colunas = precos.shape
+    # Pregões de cada ação encostados à esquerda, NaN no fim da linha
+    ordem = np.argsort(np.isnan(precos), axis=1, kind='stable')
+    mudancas = np.diff(np.take_along_axis(precos, ordem, axis=1), axis=1)
+    ganhos, perdas = np.clip(mudancas, 0, None), np.clip(-mudancas, 0, None)
+
+    compacto = np.full((linhas, colunas), np.nan)
+    media_ganhos, media_perdas = np.zeros(linhas), np.zeros(linhas)
+    for i in range(colunas - 1):
+        # Nas primeiras `periodo` variações é a média simples; depois, a suavização de Wilder
+        peso = min(i + 1, periodo)
+        media_ganhos = (media_ganhos * (peso - 1) + ganhos[:, i]) / peso
+        media_perdas = (media_perdas * (peso - 1) + perdas[:, i]) / peso
+        if i + 1 >= periodo:
+            compacto[:, i + 1] = np.where(media_perdas == 0, 100.0,
+                                          np.round(100 - 100 / (1 + media_ganhos / media_perdas), 2))
+
+    rsi = np.full((linhas, colunas), np.nan)
+    np.put_along_axis(rsi, ordem, compacto, axis=1)
+    return rsi
+
+
+def calcular_indicadores_matriz(precos, periodo_rsi=14, janelas_sma=(9, 20), janela_volatilidade=20):
+    """Indicadores de várias ações de uma vez sobre a matriz de fechamentos (ações × datas)
+
+    Datas alinhadas entre as ações, NaN onde falta pregão. Devolve matrizes do mesmo
+    formato: 'rsi' (Wilder, o mesmo do painel), 'sma' (uma por janela),
+    'retornos' (diários) e 'volatilidade' (desvio dos retornos na janela, anualizado).
+    Com NumPy cada indicador é uma operação vetorizada sobre todas as ações; sem ele,
+    a mesma conta linha a linha em Python, devolvendo listas de listas.
+    """
+    if np is None:
+        return _calcular_indicadores_listas(precos, periodo_rsi, janelas_sma, janela_volatilidade)
+
+    precos = np.asarray(precos, dtype=float)
+    if precos.ndim == 1:
+        # Uma linha só é uma ação; a lista vazia, nenhuma
+        precos = precos.reshape(1, -1) if precos.size else precos.reshape(0, 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Retornos diários (a primeira data não tem retorno)
+        retornos = np.full(precos.shape, np.nan)
+        retornos[:, 1:] = precos[:, 1:] / precos[:, :-1] - 1
+
+        sma = {janela: _somas_janela_matriz(precos, janela) / janela for janela in janelas_sma}
+
+        # Volatilidade: desvio amostral dos retornos na janela, pelas somas de x e x²
+        soma = _somas_janela_matriz(retornos, janela_volatilidade)
+        soma_quadrados = _somas_janela_matriz(np.square(retornos), janela_volatilidade)
+        variancia = (soma_quadrados - soma ** 2 / janela_volatilidade) / (janela_volatilidade - 1)
+        volatilidade = np.sqrt(np.clip(variancia, 0, None)) * PREGOES_POR_ANO ** 0.5
+
+        rsi = _rsi_wilder_matriz(precos, periodo_rsi)
+
+    return {'rsi': rsi, 'sma': sma, 'retornos': retornos, 'volatilidade': volatilidade}
+
+
+def _calcular_indicadores_listas(precos, periodo_rsi, janelas_sma, janela_volatilidade):
+    """calcular_indicadores_matriz sem NumPy: linha a linha, mesmas contas"""
+    nan = float('nan')
+    resultado = {'rsi': [], 'sma': {janela: [] for janela in janelas_sma}, 'retornos': [], 'volatilidade': []}
+
+    for linha in precos:
+        linha = [nan if preco is None else float(preco) for preco in linha]
+
+        retornos = [nan] + [atual / anterior - 1 if anterior else nan
+                            for anterior, atual in zip(linha, linha[1:])] if linha else []
+        resultado['retornos'].append(retornos)
+
+        for janela in janelas_sma:
+            resultado['sma'][janela].append([soma / janela for soma in _somas_janela_linha(linha, janela)])
+
+        somas = _somas_janela_linha(retornos, janela_volatilidade)
+        somas_quadrados = _somas_janela_linha([r * r for r in retornos], janela_volatilidade)
+        resultado['volatilidade'].append([
+            max(0.0, (sq - soma ** 2 / janela_volatilidade) / (janela_volatilidade - 1)) ** 0.5 *
+            PREGOES_POR_ANO ** 0.5 if soma == soma else nan
+            for soma, sq in zip(somas, somas_quadrados)])
+
+        # RSI de Wilder pulando as datas sem pregão da ação
+        calculadora = CalculadoraRSIWilder(periodo_rsi)
+        rsi = []
+        for preco in linha:
+            valor = calculadora.adicionar(preco) if preco == preco else None
+            rsi.append(nan if valor is None else float(valor))
+        resultado['rsi'].append(rsi)
+
+    return resultado
+
+
+class CacheRelatorios:
+    """Relatórios HTML endereçados pelo hash dos dados, com limite de espaço (LRU)"""
+
+    VERSAO = 4  # Mudou o modelo do HTML (ou o RSI exibido): relatórios antigos deixam de servir
+
+    def __init__(self, diretorio, tamanho_maximo=50 * 1024 * 1024):
+        self.diretorio = diretorio
+        self.tamanho_maximo = tamanho_maximo
+        os.makedirs(diretorio, exist_ok=True)
+
+    def chave(self, tipo, dados):
+        """sha256 dos dados de entrada do relatório"""
+        conteudo = json.dumps([self.VERSAO, tipo, dados], sort_keys=True, default=str)
+        return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, f"{chave}.html")
+
+    def obter(self, chave):
+        """Caminho do relatório já gerado, ou None"""
+        caminho = self._caminho(chave)
+        try:
+            # Data de modificação marca o uso mais recente
+            os.utime(caminho)
+        except OSError:
+            return None
+        return caminho
+
+    def salvar(self, chave, html):
+        caminho = self._caminho(chave)
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(html)
+        os.replace(temporario, caminho)
+        self._podar(caminho)
+        return caminho
+
+    def _podar(self, manter):
+        """Apagar os relatórios usados há mais tempo até caber no limite"""
+        arquivos = []
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith('.html'):
+                continue
+            caminho = os.path.join(self.diretorio, nome)
+            try:
+                estado = os.stat(caminho)
+            except OSError:
+                continue
+            arquivos.append((estado.st_mtime, estado.st_size, caminho))
+
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        for _, tamanho, caminho in sorted(arquivos):
+            if total <= self.tamanho_maximo:
+                break
+            if caminho == manter:
+                continue
+            try:
+                os.remove(caminho)
+                total -= tamanho
+            except OSError:
+                pass
+
+
 class AnalisadorAcoesReais:
     def __init__(self):
         self.janela = tk.Tk()
@@ -25,8 +2518,27 @@ class AnalisadorAcoesReais:
         
         # Dados da ação atual
         self.dados_acao = None
+        self.analise_individual = None  # Análise completa da ação, quando só uma foi analisada
         self.historico_precos = []
         self.dados_multiplos = []  # Para armazenar dados de múltiplas ações
+        self.analise_em_andamento = None  # Futures da análise múltipla que a tela acompanha
+
+        # Número máximo de chamadas simultâneas ao yfinance
+        self.max_trabalhadores = 8
+
+        # Indicadores calculados uma vez por pregão novo de cada ação
+        self.memoria_indicadores = MemoriaIndicadores(capacidade=512)
+
+        # Indicadores técnicos (plugins registrados em MotorIndicadores)
+        self.indicadores = MotorIndicadores()
+
+        # Gráficos HTML reaproveitados enquanto os dados não mudam
+        self.relatorios = CacheRelatorios(os.path.join(DIRETORIO_DADOS, 'relatorios'))
+
+        # Motor assíncrono compartilhado por todas as buscas de dados
+        self.motor = MotorDados(max_trabalhadores=self.max_trabalhadores,
+                                tamanho_pool=4, tempo_ocioso=30.0,
+                                taxa_requisicoes=5.0)
         
     def configurar_interface(self):
         # Frame principal
@@ -117,174 +2629,23 @@ class AnalisadorAcoesReais:
         
     def formatar_codigo_acao(self, codigo):
         """Formatar código da ação para diferentes APIs"""
-        codigo = codigo.strip().upper()
-        # Remove .SA se presente
-        if codigo.endswith('.SA'):
-            codigo = codigo[:-3]
-        return codigo
+        return normalizar_simbolo(codigo)
     
     def buscar_dados_yahoo_finance(self, simbolo):
         """Buscar dados do Yahoo Finance via web scraping"""
-        try:
-            # Tentar primeiro com yfinance se disponível
-            try:
-                import yfinance as yf
-                ticker = yf.Ticker(f"{simbolo}.SA")
-                info = ticker.info
-                hist = ticker.history(period="5d")
-                
-                if hist.empty:
-                    raise Exception("Sem dados históricos disponíveis")
-                
-                # Extrair dados
-                preco_atual = float(hist['Close'].iloc[-1])
-                preco_anterior = float(hist['Close'].iloc[-2]) if len(hist) > 1 else preco_atual
-                volume = int(hist['Volume'].iloc[-1])
-                alta = float(hist['High'].iloc[-1])
-                baixa = float(hist['Low'].iloc[-1])
-                
-                # Criar histórico para gráfico
-                historico = []
-                for i, (data, row) in enumerate(hist.iterrows()):
-                    historico.append({
-                        'data': data.strftime('%d/%m'),
-                        'preco': float(row['Close']),
-                        'volume': int(row['Volume'])
-                    })
-                
-                return {
-                    'sucesso': True,
-                    'fonte': 'Yahoo Finance (yfinance)',
-                    'nome': info.get('longName', f"{simbolo} S.A."),
-                    'simbolo': f"{simbolo}.SA",
-                    'preco_atual': preco_atual,
-                    'preco_anterior': preco_anterior,
-                    'volume': volume,
-                    'alta_dia': alta,
-                    'baixa_dia': baixa,
-                    'historico': historico,
-                    'setor': info.get('sector', 'N/A'),
-                    'mercado': info.get('market', 'B3')
-                }
-                
-            except ImportError:
-                # Se yfinance não está disponível, usar método alternativo
-                return self.buscar_dados_alternativos(simbolo)
-                
-        except Exception as e:
-            return {
-                'sucesso': False,
-                'erro': str(e)
-            }
+        return self.motor.executar(self.motor.buscar_dados_yahoo_finance(simbolo))
 
-    def buscar_dados_alternativos(self, simbolo):
-        """Método alternativo usando APIs públicas"""
-        try:
-            # Tentar buscar da API do Yahoo Finance diretamente
-            url = f"https://query1.finance.yahoo.com/v8/finance/chart/{simbolo}.SA"
-
-            # Headers atualizados para simular um navegador moderno
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0.0.0 Safari/537.36',
-                'Accept': 'application/json',
-                'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Connection': 'keep-alive',
-                'Referer': f'https://finance.yahoo.com/quote/{simbolo}.SA',
-                'Sec-Fetch-Dest': 'empty',
-                'Sec-Fetch-Mode': 'cors',
-                'Sec-Fetch-Site': 'same-site'
-            }
-
-            req = urllib.request.Request(url, headers=headers)
-
-            # Aumentar timeout para 15 segundos
-            with urllib.request.urlopen(req, timeout=15) as response:
-                if response.status != 200:
-                    error_msg = f"Erro HTTP {response.status}: {response.reason}"
-                    return {'sucesso': False, 'erro': error_msg}
-
-                data = json.loads(response.read().decode())
-
-            # Verificar se a resposta contém dados válidos
-            if 'chart' not in data or not data['chart']['result']:
-                return {'sucesso': False, 'erro': "Resposta da API sem dados válidos"}
+    def buscar_dados_lote(self, simbolos):
+        """Buscar cotações de várias ações em um único download do yfinance"""
+        return self.motor.executar(self.motor.buscar_dados_lote(simbolos))
 
-            result = data['chart']['result'][0]
-            meta = result['meta']
-
-            # Extrair preços com tratamento de dados ausentes
-            timestamps = result.get('timestamp', [])
-            quote = result['indicators']['quote'][0]
-            precos = quote.get('close', [])
-            volumes = quote.get('volume', [])
-            altas = quote.get('high', [])
-            baixas = quote.get('low', [])
-
-            # Filtrar valores None e criar lista de dados válidos
-            dados_validos = []
-            for i in range(len(timestamps)):
-                # Pular se preço ou volume forem nulos
-                if precos[i] is None or volumes[i] is None:
-                    continue
-
-                dados_validos.append((
-                    timestamps[i],
-                    precos[i],
-                    volumes[i],
-                    altas[i] if i < len(altas) and altas[i] is not None else precos[i],
-                    baixas[i] if i < len(baixas) and baixas[i] is not None else precos[i]
-                ))
-
-            if not dados_validos:
-                return {'sucesso': False, 'erro': "Dados de preços não disponíveis"}
-
-            # Pegar os dados mais recentes
-            ultimo = dados_validos[-1]
-            preco_atual = ultimo[1]
-            volume_atual = ultimo[2]
-            alta_atual = ultimo[3]
-            baixa_atual = ultimo[4]
-
-            # Obter preço anterior (se disponível)
-            preco_anterior = dados_validos[-2][1] if len(dados_validos) > 1 else preco_atual
-
-            # Criar histórico com os últimos 5 dias
-            historico = []
-            for dado in dados_validos[-5:]:
-                timestamp, preco, volume, alta, baixa = dado
-                data_obj = datetime.fromtimestamp(timestamp)
-                historico.append({
-                    'data': data_obj.strftime('%d/%m'),
-                    'preco': round(preco, 2),
-                    'volume': int(volume)
-                })
-
-            return {
-                'sucesso': True,
-                'fonte': 'Yahoo Finance API',
-                'nome': meta.get('shortName', f"{simbolo} S.A."),
-                'simbolo': f"{simbolo}.SA",
-                'preco_atual': round(preco_atual, 2),
-                'preco_anterior': round(preco_anterior, 2),
-                'volume': int(volume_atual),
-                'alta_dia': round(alta_atual, 2),
-                'baixa_dia': round(baixa_atual, 2),
-                'historico': historico,
-                'setor': 'N/A',
-                'mercado': 'B3'
-            }
+    def indicadores_universo(self, simbolos, limite=250):
+        """Calcular os indicadores de várias ações de uma vez (matrizes ações × datas)"""
+        return self.motor.executar(self.motor.indicadores_universo(simbolos, limite))
 
-        except urllib.error.HTTPError as e:
-            return {'sucesso': False, 'erro': f"Erro HTTP {e.code}: {e.reason}"}
-        except urllib.error.URLError as e:
-            return {'sucesso': False, 'erro': f"Erro de rede: {e.reason}"}
-        except socket.timeout:
-            return {'sucesso': False, 'erro': "Tempo limite de conexão excedido"}
-        except json.JSONDecodeError:
-            return {'sucesso': False, 'erro': "Resposta inválida da API"}
-        except Exception as e:
-            return {'sucesso': False, 'erro': f"Erro inesperado: {str(e)}"}
+    def buscar_dados_alternativos(self, simbolo):
+        """Método alternativo usando APIs públicas"""
+        return self.motor.executar(self.motor.buscar_dados_alternativos(simbolo))
     
     def calcular_variacao(self, preco_atual, preco_anterior):
         """Calcular variação percentual"""
@@ -349,72 +2710,64 @@ class AnalisadorAcoesReais:
             if len(precos) < 20:
                 return None, None
             
-            # Média de 9 períodos (curto prazo)
-            mm9 = sum(precos[-9:]) / 9 if len(precos) >= 9 else None
+            # Média de 9 períodos (curto prazo) e de 20 períodos (médio prazo)
+            series = self.calcular_series_sma(precos, (9, 20))
             
-            # Média de 20 períodos (médio prazo)
-            mm20 = sum(precos[-20:]) / 20 if len(precos) >= 20 else None
-            
-            return mm9, mm20
+            return series[9][-1], series[20][-1]
             
         except Exception:
             return None, None
 
-    def buscar_dados_fundamentalistas(self, simbolo):
-        """Buscar dados fundamentalistas da ação"""
-        try:
-            # Tentar buscar dados fundamentalistas do Yahoo Finance
-            if hasattr(self, 'dados_acao') and self.dados_acao:
-                # Tentar com yfinance se disponível
-                try:
-                    import yfinance as yf
-                    ticker = yf.Ticker(f"{simbolo}.SA")
-                    info = ticker.info
-
-                    # Extrair dados fundamentalistas
-                    dividends_per_share = info.get('dividendYield', 0)
-                    earnings_per_share = info.get('trailingEps', 0)
-                    payout_ratio = info.get('payoutRatio', 0)
-
-                    return {
-                        'dividendYield': dividends_per_share,
-                        'trailingEps': earnings_per_share,
-                        'payoutRatio': payout_ratio,
-                        'bookValue': info.get('bookValue', 0),
-                        'priceToBook': info.get('priceToBook', 0),
-                        'returnOnEquity': info.get('returnOnEquity', 0)
-                    }
+    def calcular_series_sma(self, precos, janelas):
+        """Séries de médias móveis simples para várias janelas numa passada (None onde não há dados)"""
+        return self.indicadores.calcular({'fechamento': precos},
+                                         {janela: ('sma', {'janela': janela}) for janela in janelas})
 
-                except ImportError:
-                    # Método alternativo via API
-                    url = f"https://query1.finance.yahoo.com/v10/finance/quoteSummary/{simbolo}.SA"
-                    params = "?modules=defaultKeyStatistics,financialData,summaryDetail"
-
-                    req = urllib.request.Request(url + params)
-                    req.add_header('User-Agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
-
-                    with urllib.request.urlopen(req, timeout=10) as response:
-                        data = json.loads(response.read().decode())
-
-                    result = data.get('quoteSummary', {}).get('result', [])
-                    if result:
-                        stats = result[0].get('defaultKeyStatistics', {})
-                        financial = result[0].get('financialData', {})
-                        summary = result[0].get('summaryDetail', {})
-
-                        return {
-                            'dividendYield': summary.get('dividendYield', {}).get('raw', 0),
-                            'trailingEps': stats.get('trailingEps', {}).get('raw', 0),
-                            'payoutRatio': stats.get('payoutRatio', {}).get('raw', 0),
-                            'bookValue': stats.get('bookValue', {}).get('raw', 0),
-                            'priceToBook': stats.get('priceToBook', {}).get('raw', 0),
-                            'returnOnEquity': financial.get('returnOnEquity', {}).get('raw', 0)
-                        }
+    def colunas_historico(self, historico):
+        """Colunas OHLCV do histórico de um resultado (máxima/mínima caem no preço se ausentes)"""
+        return {
+            'fechamento': [item['preco'] for item in historico],
+            'maxima': [item.get('maxima', item['preco']) for item in historico],
+            'minima': [item.get('minima', item['preco']) for item in historico],
+            'volume': [item['volume'] for item in historico]
+        }
+
+    def calcular_indicadores(self, dados_acao, historico=None):
+        """Todos os indicadores da análise numa passada, reaproveitados até a próxima barra
+
+        `historico` é a série guardada que o motor entrega no contexto; sem ela, o histórico curto da cotação.
+        """
+        if historico is None:
+            historico = dados_acao.get('historico', [])
+        # Tamanho e primeiro preço distinguem a série longa da curta e um histórico revisado
+        parametros = ('analise', len(historico), historico[0]['preco'] if historico else None)
+        return self.memorizar(dados_acao, 'indicadores', parametros, lambda: self.indicadores.calcular(
+            self.colunas_historico(historico), INDICADORES_ANALISE))
+
+    def ultimos_valores(self, indicadores):
+        """Último valor de cada série (e de cada componente de MACD/Bollinger)"""
+        def ultimo(serie):
+            if not serie or serie[-1] is None or serie[-1] != serie[-1]:
                 return None
-                
-        except Exception as e:
-            print(f"Erro ao buscar dados fundamentalistas: {e}")
-            return None
+            return round(serie[-1], 4)
+
+        valores = {}
+        for rotulo, resultado in indicadores.items():
+            if isinstance(resultado, dict):
+                valores[rotulo] = {parte: ultimo(serie) for parte, serie in resultado.items()}
+            else:
+                valores[rotulo] = ultimo(resultado)
+        return valores
+
+    def memorizar(self, dados_acao, indicador, parametros, calcular):
+        """Reaproveitar um indicador até a ação ganhar uma barra nova (ou o último preço mudar)"""
+        chave = (dados_acao['simbolo'], indicador, parametros, dados_acao.get('ultima_barra'),
+                 dados_acao['preco_atual'], len(dados_acao.get('historico', [])))
+        return self.memoria_indicadores.obter(chave, calcular)
+
+    def buscar_dados_fundamentalistas(self, simbolo):
+        """Buscar dados fundamentalistas da ação (da rede só se faltar o que o Retention Ratio usa)"""
+        return self.motor.executar(self.motor.buscar_fundamentos_retencao(simbolo))
 
     def calcular_retention_ratio(self, dados_fundamentalistas):
         """Calcular Retention Ratio (Taxa de Retenção)"""
@@ -464,18 +2817,37 @@ class AnalisadorAcoesReais:
         except Exception as e:
             return None, f"❌ Erro no cálculo: {str(e)}"
 
-    def processar_analise_individual(self, dados_acao, simbolo):
-        """Processar análise individual de uma ação"""
+    def rsi_exibido(self, rsi_wilder, ultimos):
+        """RSI do texto e do gráfico: Wilder sobre todo o histórico guardado; sem barras suficientes, o simples"""
+        if rsi_wilder is None and ultimos['rsi'] is not None:
+            return round(ultimos['rsi'], 2)
+        return rsi_wilder
+
+    def processar_analise_individual(self, dados_acao, simbolo, dados_fundamentalistas=None, rsi_wilder=None,
+                                     historico=None):
+        """Processar análise individual de uma ação (sem I/O: fundamentos, RSI de Wilder e histórico vêm do motor)"""
         variacao = self.calcular_variacao(dados_acao['preco_atual'], dados_acao['preco_anterior'])
 
-        precos_historicos = [item['preco'] for item in dados_acao.get('historico', [])]
-        rsi = self.calcular_rsi(precos_historicos)
+        if historico is None:
+            historico = dados_acao.get('historico', [])
+        precos_historicos = [item['preco'] for item in historico]
+        # Médias móveis, RSI simples e demais indicadores saem todos da mesma passada
+        indicadores = self.calcular_indicadores(dados_acao, historico)
+        ultimos = self.ultimos_valores(indicadores)
+
+        rsi = self.rsi_exibido(rsi_wilder, ultimos)
         rsi_interpretacao, rsi_cor = self.interpretar_rsi(rsi)
-        mm9, mm20 = self.calcular_medias_moveis(precos_historicos)
+        mm9, mm20 = ((indicadores['mm9'][-1], indicadores['mm20'][-1]) if len(precos_historicos) >= 20
+                     else (None, None))
 
-        dados_fundamentalistas = self.buscar_dados_fundamentalistas(simbolo)
         retention_ratio, retention_interpretacao = self.calcular_retention_ratio(dados_fundamentalistas)
 
+        # Cotações do download em lote não trazem nome/setor; usar o info já buscado
+        info = self.motor.obter_sessao(simbolo).info
+        if info:
+            dados_acao['nome'] = info.get('longName', dados_acao['nome'])
+            dados_acao['setor'] = info.get('sector', dados_acao['setor'])
+
         return {
             'dados_acao': dados_acao,
             'variacao': variacao,
@@ -483,6 +2855,8 @@ class AnalisadorAcoesReais:
             'rsi_interpretacao': rsi_interpretacao,
             'mm9': mm9,
             'mm20': mm20,
+            'indicadores': ultimos,
+            'historico': historico,
             'retention_ratio': retention_ratio,
             'retention_interpretacao': retention_interpretacao,
             'sucesso': True
@@ -500,27 +2874,20 @@ class AnalisadorAcoesReais:
 
     """
 
-        # Separar sucessos e erros
+        # Separar sucessos e erros; pendentes aguardam a busca em andamento
         sucessos = [r for r in resultados if r.get('sucesso')]
-        erros = [r for r in resultados if not r.get('sucesso')]
+        erros = [r for r in resultados if not r.get('sucesso') and not r.get('pendente')]
+        blocos = [r for r in resultados if r.get('sucesso') or r.get('pendente')]
 
-        if sucessos:
+        # Cada ação fica num trecho marcado, que pode ser trocado sozinho depois
+        trechos = []
+        if blocos:
             relatorio += "┌─────────────── ANÁLISES REALIZADAS ──────────────┐\n"
+            trechos.append((relatorio, ()))
+            relatorio = ""
 
-            for resultado in sucessos:
-                dados = resultado['dados_acao']
-                variacao = resultado['variacao']
-                rsi = resultado['rsi']
-
-                tendencia_emoji = "🟢" if variacao > 0 else "🔴" if variacao < 0 else "🟡"
-
-                relatorio += f"""
-    📈 {dados['simbolo']}
-       💰 R$ {dados['preco_atual']:.2f} ({variacao:+.2f}%) {tendencia_emoji}
-       📊 RSI: {rsi if rsi else 'N/A'} | Vol: {dados['volume']:,}
-       💎 Retention: {resultado['retention_ratio'] if resultado['retention_ratio'] else 'N/A'}%
-       ──────────────────────────────
-    """
+            for resultado in blocos:
+                trechos.append((self.gerar_bloco_acao(resultado), (self.marca_acao(resultado['simbolo']),)))
 
             relatorio += "└──────────────────────────────────────────────────┘\n\n"
 
@@ -538,9 +2905,74 @@ class AnalisadorAcoesReais:
     ⚠️  AVISO: Análise informativa, não constitui 
        recomendação de investimento.
     """
+        trechos.append((relatorio, ()))
 
         self.texto_resultado.delete(1.0, tk.END)
-        self.texto_resultado.insert(1.0, relatorio)
+        for texto, marcas in trechos:
+            self.texto_resultado.insert(tk.END, texto, marcas)
+
+    def marca_acao(self, simbolo):
+        """Tag do Text que delimita o bloco de uma ação"""
+        return f"acao_{normalizar_simbolo(simbolo)}"
+
+    def formatar_idade(self, segundos):
+        minutos = int(segundos // 60)
+        if minutos < 1:
+            return "menos de 1 min"
+        if minutos < 60:
+            return f"{minutos} min"
+        if minutos < 24 * 60:
+            return f"{minutos // 60} h"
+        return f"{minutos // (24 * 60)} dias"
+
+    def gerar_bloco_acao(self, resultado):
+        """Texto do bloco de uma ação no relatório múltiplo"""
+        if resultado.get('pendente'):
+            return f"""
+    ⏳ {resultado['simbolo']}.SA
+       Buscando dados...
+       ──────────────────────────────
+    """
+
+        dados = resultado['dados_acao']
+        variacao = resultado['variacao']
+        rsi = resultado['rsi']
+
+        tendencia_emoji = "🟢" if variacao > 0 else "🔴" if variacao < 0 else "🟡"
+
+        # Dado guardado exibido enquanto a busca não termina
+        idade = ""
+        if resultado.get('idade') is not None:
+            idade = f"\n       🕒 Dados de {self.formatar_idade(resultado['idade'])} atrás (atualizando...)"
+
+        ind = resultado['indicadores']
+
+        def numero(valor):
+            return f"{valor:.2f}" if valor is not None else 'N/A'
+
+        return f"""
+    📈 {dados['simbolo']}
+       💰 R$ {dados['preco_atual']:.2f} ({variacao:+.2f}%) {tendencia_emoji}
+       📊 RSI: {rsi if rsi else 'N/A'} | Vol: {dados['volume']:,}
+       📐 MM9: {numero(ind['mm9'])} | MM20: {numero(ind['mm20'])} | EMA9: {numero(ind['ema9'])}
+       📉 MACD: {numero(ind['macd']['macd'])} (hist. {numero(ind['macd']['histograma'])}) | ATR: {numero(ind['atr'])}
+       🎯 Bollinger: {numero(ind['bollinger']['inferior'])} – {numero(ind['bollinger']['superior'])}
+       💎 Retention: {resultado['retention_ratio'] if resultado['retention_ratio'] else 'N/A'}%{idade}
+       ──────────────────────────────
+    """
+
+    def atualizar_bloco_acao(self, resultado):
+        """Trocar no texto só o bloco da ação que acabou de chegar"""
+        if not resultado.get('sucesso'):
+            # Erros entram na seção própria quando o relatório final for montado
+            return
+        marca = self.marca_acao(resultado['simbolo'])
+        faixa = self.texto_resultado.tag_ranges(marca)
+        if not faixa:
+            return
+        inicio, fim = faixa[0], faixa[-1]
+        self.texto_resultado.delete(inicio, fim)
+        self.texto_resultado.insert(inicio, self.gerar_bloco_acao(resultado), (marca,))
 
     def gerar_ranking(self, sucessos):
         """Gerar ranking das ações analisadas"""
@@ -594,6 +3026,83 @@ class AnalisadorAcoesReais:
 
         return "Empresa distribui quase todos os lucros"
 
+    def analisar_simbolo(self, simbolo, contexto):
+        """Montar a análise de uma ação a partir do contexto preparado pelo motor (sem I/O)"""
+        try:
+            resultado = contexto['dados_acao']
+
+            if resultado['sucesso']:
+                analise = self.processar_analise_individual(resultado, simbolo, contexto['fundamentos'],
+                                                            contexto['rsi_wilder'], contexto['historico'])
+                analise['simbolo'] = simbolo
+                analise['serie_rsi'] = contexto['serie_rsi']
+                return analise
+
+            erro = resultado['erro']
+        except Exception as e:
+            erro = str(e)
+
+        return {
+            'simbolo': simbolo,
+            'erro': erro,
+            'sucesso': False
+        }
+
+    def resultado_futuro(self, futuro):
+        """Contexto de um Future do motor, com a exceção convertida em resultado de erro"""
+        try:
+            return futuro.result()
+        except Exception as e:
+            return {'dados_acao': {'sucesso': False, 'erro': str(e)}}
+
+    def acompanhar_analise(self, codigos, futuros, resultados, guardados=None):
+        """Aplicar na tela as ações que já chegaram e voltar em 100 ms até todas terminarem"""
+        if futuros is not self.analise_em_andamento:
+            # Outra análise começou: esta é descartada
+            return
+
+        if guardados is not None and guardados.done():
+            # Dados guardados só ocupam os blocos que a busca ainda não trocou
+            contextos = guardados.result() if guardados.exception() is None else []
+            for i, contexto in enumerate(contextos):
+                if resultados[i] is None:
+                    self.atualizar_bloco_acao(self.analisar_guardado(codigos[i], contexto))
+            guardados = None
+
+        for i, futuro in enumerate(futuros):
+            if resultados[i] is not None or not futuro.done():
+                continue
+            resultados[i] = self.analisar_simbolo(codigos[i], self.resultado_futuro(futuro))
+            self.atualizar_bloco_acao(resultados[i])
+            concluidos = sum(resultado is not None for resultado in resultados)
+            self.status_label.config(text=f"🔍 {codigos[i]} concluída ({concluidos}/{len(codigos)})...",
+                                     fg='blue')
+
+        if any(resultado is None for resultado in resultados):
+            self.janela.after(100, self.acompanhar_analise, codigos, futuros, resultados, guardados)
+            return
+
+        self.analise_em_andamento = None
+
+        # Gerar relatório consolidado
+        self.gerar_relatorio_multiplo(resultados)
+
+        # Salvar para gráfico; com uma ação só, o gráfico individual dela
+        self.dados_multiplos = resultados
+        unica = len(resultados) == 1 and resultados[0].get('sucesso')
+        self.analise_individual = resultados[0] if unica else None
+        self.dados_acao = resultados[0]['dados_acao'] if unica else None
+
+        self.status_label.config(text=f"✅ {len(codigos)} ações analisadas", fg='green')
+
+    def analisar_guardado(self, simbolo, contexto):
+        """Análise montada só com dados guardados (contexto_guardado do motor), marcada com a idade deles"""
+        if contexto is None:
+            return {'simbolo': simbolo, 'pendente': True, 'sucesso': False}
+        analise = self.analisar_simbolo(simbolo, contexto)
+        analise['idade'] = contexto['idade']
+        return analise
+
     def analisar_acao(self):
         """Analisar múltiplas ações"""
         codigos_texto = self.entrada_acao.get(1.0, tk.END).strip()
@@ -605,6 +3114,9 @@ class AnalisadorAcoesReais:
         # Separar códigos por linha
         codigos = [codigo.strip().upper() for codigo in codigos_texto.split('\n') if codigo.strip()]
 
+        # petr4, PETR4 e PETR4.SA são a mesma ação: analisar uma vez só
+        codigos = list(dict.fromkeys(self.formatar_codigo_acao(codigo) for codigo in codigos))
+
         if not codigos:
             messagebox.showerror("Erro", "Nenhum código válido encontrado.")
             return
@@ -618,34 +3130,18 @@ class AnalisadorAcoesReais:
             self.status_label.config(text=f"🔍 Analisando {len(codigos)} ações...", fg='blue')
             self.janela.update()
 
-            resultados_completos = []
-
-            for i, codigo_original in enumerate(codigos):
-                self.status_label.config(text=f"🔍 Analisando {codigo_original} ({i + 1}/{len(codigos)})...",
-                                         fg='blue')
-                self.janela.update()
-
-                simbolo = self.formatar_codigo_acao(codigo_original)
-                resultado = self.buscar_dados_yahoo_finance(simbolo)
-
-                if resultado['sucesso']:
-                    # Processar cada ação individualmente
-                    resultado_processado = self.processar_analise_individual(resultado, simbolo)
-                    resultados_completos.append(resultado_processado)
-                else:
-                    resultados_completos.append({
-                        'simbolo': simbolo,
-                        'erro': resultado['erro'],
-                        'sucesso': False
-                    })
-
-            # Gerar relatório consolidado
-            self.gerar_relatorio_multiplo(resultados_completos)
+            # Cada análise começa com contexto novo; gráficos reaproveitam o desta análise
+            self.motor.nova_analise()
+            self.dados_acao = self.analise_individual = None
 
-            # Salvar para gráfico
-            self.dados_multiplos = resultados_completos
+            # Blocos pendentes já na tela; os dados guardados e depois os da busca trocam cada um
+            self.gerar_relatorio_multiplo([self.analisar_guardado(codigo, None) for codigo in codigos])
 
-            self.status_label.config(text=f"✅ {len(codigos)} ações analisadas", fg='green')
+            # Armazém e rede só no motor; a janela segue respondendo e só aplica os resultados
+            guardados = self.motor.agendar(self.motor.preparar_guardados(codigos))
+            futuros = self.motor.agendar_lote(codigos)
+            self.analise_em_andamento = futuros
+            self.acompanhar_analise(codigos, futuros, [None] * len(codigos), guardados)
 
         except Exception as e:
             messagebox.showerror("Erro", f"Erro na análise: {str(e)}")
@@ -653,10 +3149,10 @@ class AnalisadorAcoesReais:
 
     def mostrar_grafico(self):
         """Determinar qual tipo de gráfico mostrar"""
-        if hasattr(self, 'dados_multiplos') and self.dados_multiplos:
-            self.mostrar_grafico_multiplo()
-        elif hasattr(self, 'dados_acao') and self.dados_acao:
+        if hasattr(self, 'dados_acao') and self.dados_acao:
             self.mostrar_grafico_individual()
+        elif hasattr(self, 'dados_multiplos') and self.dados_multiplos:
+            self.mostrar_grafico_multiplo()
         else:
             messagebox.showwarning("Aviso", "Analise uma ação primeiro.")
 
@@ -667,38 +3163,29 @@ class AnalisadorAcoesReais:
             return
 
         try:
-            historico = self.dados_acao.get('historico', [])
+            # Tudo vem da análise já feita: a série guardada e o RSI preparados pelo motor
+            analise = self.analise_individual
+            historico = analise['historico']
             
             if not historico:
                 messagebox.showwarning("Aviso", "Dados históricos não disponíveis para gráfico.")
                 return
-            
-            # Calcular indicadores técnicos
-            precos_historicos = [item['preco'] for item in historico]
-            rsi_valores = []
-            
-            # Calcular RSI para cada ponto (se tiver dados suficientes)
-            for i in range(len(precos_historicos)):
-                if i >= 13:  # Precisa de pelo menos 14 pontos
-                    rsi_ponto = self.calcular_rsi(precos_historicos[:i+1])
-                    rsi_valores.append(rsi_ponto if rsi_ponto else 0)
-                else:
-                    rsi_valores.append(0)
-            
-            # Calcular médias móveis para cada ponto
-            mm9_valores = []
-            mm20_valores = []
-            
-            for i in range(len(precos_historicos)):
-                if i >= 8:  # MM9
-                    mm9_valores.append(sum(precos_historicos[max(0, i-8):i+1]) / min(9, i+1))
-                else:
-                    mm9_valores.append(None)
-                    
-                if i >= 19:  # MM20
-                    mm20_valores.append(sum(precos_historicos[max(0, i-19):i+1]) / min(20, i+1))
-                else:
-                    mm20_valores.append(None)
+
+            # Calcular indicadores técnicos (a mesma passada da análise, se não houve barra nova)
+            indicadores = self.calcular_indicadores(self.dados_acao, historico)
+            ultimos = self.ultimos_valores(indicadores)
+
+            # Mesmo RSI do texto: série de Wilder sobre o histórico guardado, se houver barras para ela
+            rsi_atual = analise['rsi']
+            serie_wilder = analise['serie_rsi']
+            rsi_valores = serie_wilder if serie_wilder and serie_wilder[-1] is not None else indicadores['rsi']
+            # Chart.js não entende NaN: pontos sem RSI ficam em 0, como antes
+            rsi_valores = [0] * (len(historico) - len(rsi_valores)) + \
+                [0 if valor is None or valor != valor else valor for valor in rsi_valores]
+
+            # Médias móveis e bandas de Bollinger para cada ponto
+            mm9_valores, mm20_valores = indicadores['mm9'], indicadores['mm20']
+            bollinger = indicadores['bollinger']
             
             # Calcular variação atual
             variacao = self.calcular_variacao(
@@ -706,10 +3193,15 @@ class AnalisadorAcoesReais:
                 self.dados_acao['preco_anterior']
             )
 
-            # Calcular Retention Ratio para o gráfico
-            dados_fundamentalistas = self.buscar_dados_fundamentalistas(
-                self.formatar_codigo_acao(self.dados_acao['simbolo'].replace('.SA', '')))
-            retention_ratio, retention_interpretacao = self.calcular_retention_ratio(dados_fundamentalistas)
+            retention_ratio = analise['retention_ratio']
+
+            # Mesmos dados de um gráfico já gerado: só reabrir
+            chave = self.relatorios.chave('individual', [self.dados_acao, historico, rsi_atual, retention_ratio])
+            caminho_html = self.relatorios.obter(chave)
+            if caminho_html:
+                webbrowser.open('file://' + os.path.realpath(caminho_html))
+                self.status_label.config(text="📈 Gráfico interativo aberto no navegador!", fg='green')
+                return
 
             # Preparar dados para JavaScript
             labels = [item['data'] for item in historico]
@@ -831,12 +3323,24 @@ class AnalisadorAcoesReais:
             </div>
             <div class="info-card">
                 <h3>RSI (14)</h3>
-                <div class="value">{self.calcular_rsi([item['preco'] for item in historico]) or 'N/A'}</div>
+                <div class="value">{rsi_atual or 'N/A'}</div>
             </div>
             <div class="info-card">
                 <h3>Tendência MM</h3>
                 <div class="value" style="font-size: 1.2em;">{'📈' if mm9_valores[-1] and mm20_valores[-1] and mm9_valores[-1] > mm20_valores[-1] else '📉' if mm9_valores[-1] and mm20_valores[-1] and mm9_valores[-1] < mm20_valores[-1] else '➡️'}</div>
             </div>
+            <div class="info-card">
+                <h3>MACD (12, 26, 9)</h3>
+                <div class="value">{f"{ultimos['macd']['histograma']:+.2f}" if ultimos['macd']['histograma'] is not None else 'N/A'}</div>
+            </div>
+            <div class="info-card">
+                <h3>ATR (14)</h3>
+                <div class="value">{f"R$ {ultimos['atr']:.2f}" if ultimos['atr'] is not None else 'N/A'}</div>
+            </div>
+            <div class="info-card">
+                <h3>OBV</h3>
+                <div class="value">{f"{ultimos['obv']:,.0f}" if ultimos['obv'] is not None else 'N/A'}</div>
+            </div>
         </div>
         
         <div class="chart-container">
@@ -913,6 +3417,24 @@ class AnalisadorAcoesReais:
                     tension: 0.4,
                     pointRadius: 2,
                     pointHoverRadius: 6
+                }}, {{
+                    label: 'Bollinger Superior',
+                    data: {json.dumps(bollinger['superior'])},
+                    borderColor: '#a0a0a0',
+                    backgroundColor: 'transparent',
+                    borderWidth: 1,
+                    borderDash: [5, 5],
+                    fill: false,
+                    pointRadius: 0
+                }}, {{
+                    label: 'Bollinger Inferior',
+                    data: {json.dumps(bollinger['inferior'])},
+                    borderColor: '#a0a0a0',
+                    backgroundColor: 'transparent',
+                    borderWidth: 1,
+                    borderDash: [5, 5],
+                    fill: false,
+                    pointRadius: 0
                 }}]
             }},
             options: {{
@@ -1137,9 +3659,7 @@ class AnalisadorAcoesReais:
 """
             
             # Salvar e abrir
-            with tempfile.NamedTemporaryFile('w', delete=False, suffix='.html', encoding='utf-8') as f:
-                f.write(html_content)
-                caminho_html = f.name
+            caminho_html = self.relatorios.salvar(chave, html_content)
             
             webbrowser.open('file://' + os.path.realpath(caminho_html))
             self.status_label.config(text="📈 Gráfico interativo aberto no navegador!", fg='green')
@@ -1168,6 +3688,7 @@ class AnalisadorAcoesReais:
             for i, resultado in enumerate(sucessos):
                 dados = resultado['dados_acao']
                 variacao = resultado['variacao']
+                indicadores = resultado['indicadores']
 
                 acoes_dados.append({
                     'simbolo': dados['simbolo'],
@@ -1178,9 +3699,23 @@ class AnalisadorAcoesReais:
                     'historico': dados.get('historico', []),
                     'rsi': resultado.get('rsi'),
                     'retention_ratio': resultado.get('retention_ratio'),
+                    'mm9': indicadores['mm9'],
+                    'mm20': indicadores['mm20'],
+                    'ema9': indicadores['ema9'],
+                    'macd': indicadores['macd']['histograma'],
+                    'atr': indicadores['atr'],
+                    'bollinger': (indicadores['bollinger']['inferior'], indicadores['bollinger']['superior']),
                     'cor': cores[i % len(cores)]
                 })
 
+            # Mesmos dados de um gráfico já gerado: só reabrir
+            chave = self.relatorios.chave('multiplo', acoes_dados)
+            caminho_html = self.relatorios.obter(chave)
+            if caminho_html:
+                webbrowser.open('file://' + os.path.realpath(caminho_html))
+                self.status_label.config(text="📊 Gráfico comparativo aberto no navegador!", fg='green')
+                return
+
             # Criar HTML para gráfico múltiplo
             html_content = f"""
 <!DOCTYPE html>
@@ -1284,6 +3819,9 @@ class AnalisadorAcoesReais:
 
         <div class="summary-grid">"""
 
+            def numero(valor):
+                return f"{valor:.2f}" if valor is not None else 'N/A'
+
             # Adicionar cards das ações
             for acao in acoes_dados:
                 variacao_class = 'positive' if acao['variacao'] > 0 else 'negative' if acao['variacao'] < 0 else 'neutral'
@@ -1292,7 +3830,10 @@ class AnalisadorAcoesReais:
                 <h3>{acao['simbolo']}</h3>
                 <div class="stock-price">R$ {acao['preco_atual']:.2f}</div>
                 <div class="stock-variation {variacao_class}">{acao['variacao']:+.2f}%</div>
-                <small>Vol: {acao['volume']:,}</small>
+                <small>Vol: {acao['volume']:,}</small><br>
+                <small>MM9 {numero(acao['mm9'])} • MM20 {numero(acao['mm20'])} • EMA9 {numero(acao['ema9'])}</small><br>
+                <small>MACD (hist.) {numero(acao['macd'])} • ATR {numero(acao['atr'])}</small><br>
+                <small>Bollinger {numero(acao['bollinger'][0])} – {numero(acao['bollinger'][1])}</small>
             </div>"""
 
             html_content += f"""
@@ -1300,7 +3841,7 @@ class AnalisadorAcoesReais:
 
         <div class="chart-container">
             <h2 style="text-align: center; color: #2c3e50; margin-bottom: 30px;">
-                📈 Comparativo de Preços Atuais
+                📈 Preço Atual e Médias Móveis
             </h2>
             <div class="chart-wrapper chart-small">
                 <canvas id="graficoComparativo"></canvas>
@@ -1353,6 +3894,9 @@ class AnalisadorAcoesReais:
             'volume': a['volume'],
             'rsi': a['rsi'],
             'retention': a['retention_ratio'],
+            'mm9': a['mm9'],
+            'mm20': a['mm20'],
+            'ema9': a['ema9'],
             'cor': a['cor']
         } for a in acoes_dados])};
 
@@ -1368,17 +3912,35 @@ class AnalisadorAcoesReais:
                     backgroundColor: acoes.map(a => a.cor + '80'),
                     borderColor: acoes.map(a => a.cor),
                     borderWidth: 2
+                }}, {{
+                    label: 'MM9',
+                    data: acoes.map(a => a.mm9),
+                    backgroundColor: '#FF980080',
+                    borderColor: '#FF9800',
+                    borderWidth: 1
+                }}, {{
+                    label: 'MM20',
+                    data: acoes.map(a => a.mm20),
+                    backgroundColor: '#9C27B080',
+                    borderColor: '#9C27B0',
+                    borderWidth: 1
+                }}, {{
+                    label: 'EMA9',
+                    data: acoes.map(a => a.ema9),
+                    backgroundColor: '#00BCD480',
+                    borderColor: '#00BCD4',
+                    borderWidth: 1
                 }}]
             }},
             options: {{
                 responsive: true,
                 maintainAspectRatio: false,
                 plugins: {{
-                    legend: {{ display: false }},
+                    legend: {{ display: true, position: 'top' }},
                     tooltip: {{
                         callbacks: {{
                             label: function(context) {{
-                                return 'Preço: R$ ' + context.parsed.y.toFixed(2);
+                                return context.dataset.label + ': R$ ' + context.parsed.y.toFixed(2);
                             }}
                         }}
                     }}
@@ -1590,9 +4152,7 @@ class AnalisadorAcoesReais:
 """
 
             # Salvar e abrir
-            with tempfile.NamedTemporaryFile('w', delete=False, suffix='.html', encoding='utf-8') as f:
-                f.write(html_content)
-                caminho_html = f.name
+            caminho_html = self.relatorios.salvar(chave, html_content)
 
             webbrowser.open('file://' + os.path.realpath(caminho_html))
             self.status_label.config(text="📊 Gráfico comparativo aberto no navegador!", fg='green')
@@ -1639,6 +4199,8 @@ Digite uma ação acima para começar! 📈
             self.janela.mainloop()
         except KeyboardInterrupt:
             self.janela.quit()
+        finally:
+            self.motor.encerrar()
 
 
 if __name__ == "__main__":